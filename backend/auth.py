@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -6,6 +7,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import asyncio
 import os
 import uuid
 
@@ -13,7 +15,23 @@ from database import get_db
 from models import Customer, RefreshToken
 
 # Password hashing
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+pwd_context = CryptContext(
+    schemes=['bcrypt'],
+    deprecated='auto',
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    # Хеш з іншою вартістю вважається застарілим (перехешування при вході - PASSWORD_REHASH_ON_LOGIN)
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt займає CPU на 50-300 мс - виконується в пулі потоків (bcrypt відпускає GIL), не в event loop
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+# Скільки операцій може чекати понад PASSWORD_HASH_WORKERS; більше - 503, щоб сплеск входів не накопичувався
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', '64'))
+PASSWORD_REHASH_ON_LOGIN = os.getenv('PASSWORD_REHASH_ON_LOGIN', '0') == '1'
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
 
 # JWT settings
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
@@ -23,12 +41,59 @@ REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRE_DAYS', '7'))
 
 security = HTTPBearer()
 
+class PasswordQueueStats:
+    """bcrypt operations waiting or running in the executor (reported by /api/health)"""
+    
+    def __init__(self):
+        self.depth = 0
+        self.peak = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+    
+    def to_dict(self) -> dict:
+        return {
+            'depth': self.depth,
+            'peak': self.peak,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'workers': PASSWORD_HASH_WORKERS,
+        }
+
+password_queue = PasswordQueueStats()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_password_task(func, *args):
+    """Run a blocking bcrypt call in the password executor"""
+    if password_queue.depth >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        password_queue.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Too many sign-in attempts, please try again',
+            headers={'Retry-After': '1'},
+        )
+    
+    password_queue.depth += 1
+    password_queue.peak = max(password_queue.peak, password_queue.depth)
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    except Exception:
+        password_queue.failed += 1
+        raise
+    finally:
+        password_queue.depth -= 1
+    password_queue.completed += 1
+    return result
+
+async def hash_password(password: str) -> str:
+    return await _run_password_task(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -85,6 +150,11 @@ async def get_current_user(
     return customer
 
 async def authenticate_customer(db: AsyncSession, email: str, password: str) -> Optional[Customer]:
+    """
+    Customer for valid credentials, None otherwise. With PASSWORD_REHASH_ON_LOGIN
+    a hash made with another cost (BCRYPT_ROUNDS) is replaced on the customer -
+    it is saved by the caller's commit.
+    """
     result = await db.execute(select(Customer).where(Customer.email == email))
     customer = result.scalar_one_or_none()
     
@@ -92,7 +162,14 @@ async def authenticate_customer(db: AsyncSession, email: str, password: str) ->
         return None
     if not customer.password_hash:
         return None
-    if not verify_password(password, customer.password_hash):
+    
+    if PASSWORD_REHASH_ON_LOGIN:
+        valid, new_hash = await _run_password_task(pwd_context.verify_and_update, password, customer.password_hash)
+        if valid and new_hash:
+            customer.password_hash = new_hash
+    else:
+        valid = await _run_password_task(verify_password, password, customer.password_hash)
+    if not valid:
         return None
     
     return customer
\ No newline at end of file
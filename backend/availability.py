@@ -0,0 +1,321 @@
+"""
+Date-aware availability engine.
+
+For every product with reservations the engine keeps day-indexed occupancy
+timelines (NumPy arrays over a rolling calendar window): one for hard
+reservations (ProductReservation) and one for active soft reservations
+(SoftReservation). "How many units of P are taken over [from, until]" is
+the max of the timeline over that day range, so its cost does not depend on
+how many reservations the product has.
+
+The timelines are rebuilt from MySQL at startup and then periodically, which
+also picks up reservations written by the warehouse system. Writes made by
+this API are applied incrementally as soon as they are committed; the ones
+applied while a rebuild is reading MySQL are replayed on top of the rebuilt
+timelines (every update is idempotent), so they are not lost with the swap.
+Expired soft reservations are dropped lazily on read.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ProductReservation, SoftReservation
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_ENGINE_ENABLED = os.getenv('AVAILABILITY_ENGINE_ENABLED', '1') == '1'
+# Вікно календаря: кілька днів у минулому (поточні оренди) і горизонт бронювань
+AVAILABILITY_PAST_DAYS = int(os.getenv('AVAILABILITY_PAST_DAYS', '30'))
+AVAILABILITY_WINDOW_DAYS = int(os.getenv('AVAILABILITY_WINDOW_DAYS', '730'))
+AVAILABILITY_RESYNC_SECONDS = int(os.getenv('AVAILABILITY_RESYNC_SECONDS', '300'))
+
+
+def sweep_occupancy(intervals: Iterable[Tuple[int, int, int, int]], days: int) -> Dict[int, np.ndarray]:
+    """
+    Vectorized difference-array sweep.
+    intervals are (product_id, start, end, quantity) with inclusive day indexes in [0, days);
+    returns product_id -> units occupied on each day.
+    """
+    intervals = list(intervals)
+    if not intervals:
+        return {}
+    data = np.array(intervals, dtype=np.int64)
+    product_ids, rows = np.unique(data[:, 0], return_inverse=True)
+
+    # +q у день початку, -q після дня завершення, далі накопичувальна сума по рядку товару
+    diff = np.zeros((len(product_ids), days + 1), dtype=np.int64)
+    np.add.at(diff, (rows, data[:, 1]), data[:, 3])
+    np.add.at(diff, (rows, data[:, 2] + 1), -data[:, 3])
+    occupancy = np.cumsum(diff[:, :-1], axis=1).astype(np.int32)
+
+    return {int(product_id): occupancy[i] for i, product_id in enumerate(product_ids)}
+
+
+class AvailabilityEngine:
+    """Per-product occupancy timelines with range-max queries"""
+
+    def __init__(self):
+        self.origin: Optional[date] = None
+        self.days = AVAILABILITY_WINDOW_DAYS
+        self._hard: Dict[int, np.ndarray] = {}
+        self._soft: Dict[int, np.ndarray] = {}
+        # reservation id -> (product_id, start, end, quantity) in window indexes
+        self._hard_entries: Dict[str, Tuple[int, int, int, int]] = {}
+        # (board_id, product_id) -> (start, end, quantity, expires_at)
+        self._soft_entries: Dict[Tuple[str, int], Tuple[int, int, int, datetime]] = {}
+        self._soft_expiry: list = []
+        self.version = 0
+        # (method name, args) of updates applied while load() is running; None outside load()
+        self._pending: Optional[list] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return AVAILABILITY_ENGINE_ENABLED and self.version > 0
+
+    # ------------------------------------------------------------------
+    # Calendar window
+    # ------------------------------------------------------------------
+
+    def _span(self, reserved_from: date, reserved_until: date) -> Optional[Tuple[int, int]]:
+        """Clamp a date range to window indexes (inclusive); None if it does not touch the window"""
+        start = (reserved_from - self.origin).days
+        end = (reserved_until - self.origin).days
+        if end < 0 or start >= self.days or end < start:
+            return None
+        return max(start, 0), min(end, self.days - 1)
+
+    def covers(self, reserved_from: date, reserved_until: date) -> bool:
+        """True if the whole range is inside the calendar window"""
+        if not self.is_ready:
+            return False
+        return (reserved_from - self.origin).days >= 0 and (reserved_until - self.origin).days < self.days
+
+    def _timeline(self, timelines: Dict[int, np.ndarray], product_id: int) -> np.ndarray:
+        timeline = timelines.get(product_id)
+        if timeline is None:
+            timeline = timelines[product_id] = np.zeros(self.days, dtype=np.int32)
+        return timeline
+
+    # ------------------------------------------------------------------
+    # Full rebuild
+    # ------------------------------------------------------------------
+
+    async def load(self, db: AsyncSession):
+        """Rebuild all timelines from MySQL (two queries)"""
+        self._pending = []
+        try:
+            await self._rebuild(db)
+        finally:
+            pending, self._pending = self._pending, None
+        # Зміни, закомічені під час читання, могли не потрапити у вибірку
+        for method, args in pending:
+            getattr(self, method)(*args)
+
+    async def _rebuild(self, db: AsyncSession):
+        started = time.perf_counter()
+        origin = date.today() - timedelta(days=AVAILABILITY_PAST_DAYS)
+        horizon = origin + timedelta(days=self.days - 1)
+        now = datetime.utcnow()
+
+        hard_result = await db.execute(
+            select(
+                ProductReservation.id,
+                ProductReservation.product_id,
+                ProductReservation.quantity,
+                ProductReservation.reserved_from,
+                ProductReservation.reserved_until,
+            ).where(
+                and_(
+                    ProductReservation.status == 'active',
+                    ProductReservation.reserved_until >= origin,
+                    ProductReservation.reserved_from <= horizon
+                )
+            )
+        )
+        hard_rows = hard_result.all()
+
+        soft_result = await db.execute(
+            select(
+                SoftReservation.board_id,
+                SoftReservation.product_id,
+                SoftReservation.quantity,
+                SoftReservation.reserved_from,
+                SoftReservation.reserved_until,
+                SoftReservation.expires_at,
+            ).where(
+                and_(
+                    SoftReservation.status == 'active',
+                    SoftReservation.expires_at > now,
+                    SoftReservation.reserved_until >= origin,
+                    SoftReservation.reserved_from <= horizon
+                )
+            )
+        )
+        soft_rows = soft_result.all()
+
+        self.origin = origin
+        # Рядки з reserved_until < reserved_from (дані складу) _span відкидає
+        hard_entries = {}
+        for row in hard_rows:
+            span = self._span(row.reserved_from, row.reserved_until)
+            if span is not None:
+                hard_entries[row.id] = (row.product_id, span[0], span[1], row.quantity or 0)
+
+        soft_entries = {}
+        for row in soft_rows:
+            span = self._span(row.reserved_from, row.reserved_until)
+            if span is not None:
+                soft_entries[(row.board_id, row.product_id)] = (span[0], span[1], row.quantity or 0, row.expires_at)
+
+        self._hard = sweep_occupancy(hard_entries.values(), self.days)
+        self._soft = sweep_occupancy(
+            ((key[1], start, end, quantity) for key, (start, end, quantity, _) in soft_entries.items()),
+            self.days
+        )
+        self._hard_entries = hard_entries
+        self._soft_entries = soft_entries
+        self._soft_expiry = [(expires_at, key) for key, (_, _, _, expires_at) in soft_entries.items()]
+        heapq.heapify(self._soft_expiry)
+        self.version += 1
+
+        logger.info(
+            f"Availability timelines built: {len(hard_entries)} hard, {len(soft_entries)} soft reservations, "
+            f"{len(set(self._hard) | set(self._soft))} products in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    # ------------------------------------------------------------------
+    # Incremental updates (call after the write is committed)
+    # ------------------------------------------------------------------
+
+    def _record(self, method: str, *args):
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    def add_hard(self, reservation_id: str, product_id: int, reserved_from: date, reserved_until: date, quantity: int):
+        self._record('add_hard', reservation_id, product_id, reserved_from, reserved_until, quantity)
+        if not self.is_ready or reservation_id in self._hard_entries:
+            return
+        span = self._span(reserved_from, reserved_until)
+        if span is None:
+            return
+        start, end = span
+        self._timeline(self._hard, product_id)[start:end + 1] += quantity
+        self._hard_entries[reservation_id] = (product_id, start, end, quantity)
+
+    def set_soft(
+        self,
+        board_id: str,
+        product_id: int,
+        reserved_from: date,
+        reserved_until: date,
+        quantity: int,
+        expires_at: datetime
+    ):
+        """Create or replace the soft reservation of a board for a product"""
+        self._record('set_soft', board_id, product_id, reserved_from, reserved_until, quantity, expires_at)
+        if not self.is_ready:
+            return
+        self._remove_soft(board_id, product_id)
+        span = self._span(reserved_from, reserved_until)
+        if span is None:
+            return
+        start, end = span
+        key = (board_id, product_id)
+        self._timeline(self._soft, product_id)[start:end + 1] += quantity
+        self._soft_entries[key] = (start, end, quantity, expires_at)
+        heapq.heappush(self._soft_expiry, (expires_at, key))
+
+    def remove_soft(self, board_id: str, product_id: int):
+        self._record('remove_soft', board_id, product_id)
+        self._remove_soft(board_id, product_id)
+
+    def _remove_soft(self, board_id: str, product_id: int):
+        entry = self._soft_entries.pop((board_id, product_id), None)
+        if entry is None:
+            return
+        start, end, quantity, _ = entry
+        self._soft[product_id][start:end + 1] -= quantity
+
+    def remove_board_soft(self, board_id: str):
+        self._record('remove_board_soft', board_id)
+        for key in [key for key in self._soft_entries if key[0] == board_id]:
+            self._remove_soft(*key)
+
+    def _expire_soft(self):
+        now = datetime.utcnow()
+        while self._soft_expiry and self._soft_expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._soft_expiry)
+            entry = self._soft_entries.get(key)
+            # Запис міг бути продовжений - тоді в купі лежить новіший expires_at
+            if entry is not None and entry[3] == expires_at:
+                self._remove_soft(*key)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def daily_reserved(
+        self,
+        product_id: int,
+        reserved_from: date,
+        reserved_until: date,
+        exclude_board_id: Optional[str] = None
+    ) -> np.ndarray:
+        """Units held by hard + active soft reservations on each day of the range (must be covered)"""
+        self._expire_soft()
+        start = (reserved_from - self.origin).days
+        end = (reserved_until - self.origin).days
+
+        occupied = np.zeros(end - start + 1, dtype=np.int32)
+        hard = self._hard.get(product_id)
+        soft = self._soft.get(product_id)
+        if hard is not None:
+            occupied += hard[start:end + 1]
+        if soft is not None:
+            occupied += soft[start:end + 1]
+
+        # Власна м'яка резервація мудборду не повинна блокувати сам мудборд
+        own = self._soft_entries.get((exclude_board_id, product_id)) if exclude_board_id else None
+        if own is not None:
+            own_start, own_end, own_quantity, _ = own
+            lo, hi = max(start, own_start), min(end, own_end)
+            if lo <= hi:
+                occupied[lo - start:hi - start + 1] -= own_quantity
+
+        return occupied
+
+    def reserved(
+        self,
+        product_id: int,
+        reserved_from: date,
+        reserved_until: date,
+        exclude_board_id: Optional[str] = None
+    ) -> int:
+        """Max units held by hard + active soft reservations on any day of the range"""
+        if product_id not in self._hard and product_id not in self._soft:
+            return 0
+        return int(self.daily_reserved(product_id, reserved_from, reserved_until, exclude_board_id).max())
+
+
+availability = AvailabilityEngine()
+
+
+async def run_availability_sync(session_factory):
+    """Background loop: rebuild timelines every AVAILABILITY_RESYNC_SECONDS (also rolls the window)"""
+    while True:
+        try:
+            async with session_factory() as db:
+                await availability.load(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Availability timelines rebuild failed: {e}")
+        await asyncio.sleep(AVAILABILITY_RESYNC_SECONDS)
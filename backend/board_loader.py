@@ -0,0 +1,89 @@
+"""
+Batched loading of event boards for API responses.
+
+Every board endpoint returns boards with their items and nested products.
+Instead of one query per board and one per item, items and products for any
+number of boards are fetched in a single joined query.
+"""
+from typing import Dict, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import EventBoard, EventBoardItem, Product
+from cover_store import cover_image_url, cover_urls
+
+
+def item_to_dict(item: EventBoardItem, product: Product) -> dict:
+    """Serialize a board item with its product into EventBoardItemResponse shape"""
+    return {
+        'id': item.id,
+        'board_id': item.board_id,
+        'product_id': item.product_id,
+        'quantity': item.quantity,
+        'notes': item.notes,
+        'section': item.section,
+        'position': item.position,
+        'added_at': item.added_at,
+        'product': product
+    }
+
+
+def board_to_dict(board: EventBoard, items: List[dict]) -> dict:
+    """Serialize a board into EventBoardResponse shape"""
+    return {
+        'id': board.id,
+        'customer_id': board.customer_id,
+        'board_name': board.board_name,
+        'event_date': board.event_date,
+        'event_type': board.event_type,
+        'rental_start_date': board.rental_start_date,
+        'rental_end_date': board.rental_end_date,
+        'rental_days': board.rental_days,
+        'status': board.status,
+        'notes': board.notes,
+        'cover_image': cover_image_url(board.cover_image),
+        'cover_variants': cover_urls(board.cover_image),
+        'budget': board.budget,
+        'estimated_total': board.estimated_total,
+        'canvas_layout': board.canvas_layout,
+        'canvas_revision': board.canvas_revision or 0,
+        'created_at': board.created_at,
+        'updated_at': board.updated_at,
+        'converted_to_order_id': board.converted_to_order_id,
+        'items': items
+    }
+
+
+async def load_board_items(db: AsyncSession, board_ids: Sequence[str]) -> Dict[str, List[dict]]:
+    """
+    Load items with their products for all given boards in one query.
+    Returns {board_id: [item_dict, ...]} ordered by item position.
+    """
+    items_by_board: Dict[str, List[dict]] = {board_id: [] for board_id in board_ids}
+    if not board_ids:
+        return items_by_board
+
+    result = await db.execute(
+        select(EventBoardItem, Product)
+        .outerjoin(Product, Product.product_id == EventBoardItem.product_id)
+        .where(EventBoardItem.board_id.in_(list(board_ids)))
+        .order_by(EventBoardItem.board_id, EventBoardItem.position)
+    )
+
+    for item, product in result.all():
+        items_by_board[item.board_id].append(item_to_dict(item, product))
+
+    return items_by_board
+
+
+async def load_boards(db: AsyncSession, boards: Sequence[EventBoard]) -> List[dict]:
+    """Build EventBoardResponse dicts for boards, keeping their order"""
+    items_by_board = await load_board_items(db, [board.id for board in boards])
+    return [board_to_dict(board, items_by_board[board.id]) for board in boards]
+
+
+async def load_board(db: AsyncSession, board: EventBoard) -> dict:
+    """Build EventBoardResponse dict for a single board"""
+    boards = await load_boards(db, [board])
+    return boards[0]
@@ -0,0 +1,95 @@
+"""
+Estimated totals of event boards.
+
+EventBoard.estimated_total is the sum of rental_price * quantity over the
+board's items, multiplied by rental_days (0 while the board has no dates).
+Endpoints keep the column current with a delta per item operation and a
+rescale when the dates change, so readers never sum items themselves.
+
+Product prices change with warehouse syncs and rows can be edited outside
+the API, so a background verifier periodically recomputes the totals of all
+open boards with one UPDATE and fixes only the rows that drifted.
+"""
+import asyncio
+import logging
+import os
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import EventBoard, EventBoardItem, Product
+
+logger = logging.getLogger(__name__)
+
+# 0 вимикає фонову звірку
+BOARD_TOTALS_VERIFY_SECONDS = int(os.getenv('BOARD_TOTALS_VERIFY_SECONDS', '3600'))
+
+CENTS = Decimal('0.01')
+
+
+def apply_item_delta(board: EventBoard, rental_price: Optional[Decimal], quantity_delta: int):
+    """Add the cost of quantity_delta units of a product (negative to subtract)"""
+    if not rental_price or not board.rental_days or not quantity_delta:
+        return
+    board.estimated_total = (board.estimated_total or 0) + Decimal(rental_price) * quantity_delta * board.rental_days
+
+
+def _daily_total(board_id):
+    """Per-day cost of a board's items (board_id may be a column for a correlated subquery)"""
+    return (
+        select(func.coalesce(func.sum(Product.rental_price * EventBoardItem.quantity), 0))
+        .select_from(EventBoardItem)
+        .join(Product, Product.product_id == EventBoardItem.product_id)
+        .where(EventBoardItem.board_id == board_id)
+    )
+
+
+async def rescale_for_dates(db: AsyncSession, board: EventBoard, old_rental_days: Optional[int]):
+    """Update the total after rental_days changed (from old_rental_days)"""
+    if board.rental_days == old_rental_days:
+        return
+    if not board.rental_days:
+        board.estimated_total = 0
+    elif old_rental_days and board.estimated_total:
+        board.estimated_total = (Decimal(board.estimated_total) / old_rental_days * board.rental_days).quantize(CENTS)
+    else:
+        # Без попередніх дат загальна сума була 0 - денну вартість беремо одним агрегатом
+        result = await db.execute(_daily_total(board.id))
+        board.estimated_total = Decimal(result.scalar() or 0) * board.rental_days
+
+
+async def reconcile_estimated_totals(db: AsyncSession) -> int:
+    """Recompute totals of all not converted boards in one UPDATE; returns the number of fixed boards"""
+    expected = func.coalesce(EventBoard.rental_days, 0) * _daily_total(EventBoard.id).scalar_subquery()
+
+    result = await db.execute(
+        update(EventBoard)
+        .where(
+            and_(
+                EventBoard.status != 'converted',
+                or_(EventBoard.estimated_total.is_(None), EventBoard.estimated_total != expected)
+            )
+        )
+        # updated_at явно - звірка не повинна піднімати мудборд у списку
+        .values(estimated_total=expected, updated_at=EventBoard.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def run_board_totals_verifier(session_factory):
+    """Background loop: reconcile estimated totals every BOARD_TOTALS_VERIFY_SECONDS"""
+    while True:
+        await asyncio.sleep(BOARD_TOTALS_VERIFY_SECONDS)
+        try:
+            async with session_factory() as db:
+                fixed = await reconcile_estimated_totals(db)
+                await db.commit()
+            if fixed:
+                logger.warning(f"Board totals verifier fixed {fixed} boards")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Board totals verification failed: {e}")
@@ -0,0 +1,384 @@
+"""
+In-process snapshot of the product catalog.
+
+The products table is synced in from the warehouse and is read-mostly, so
+product endpoints serve reads from memory. The snapshot is loaded once at
+startup and then refreshed incrementally: each poll pulls only the rows whose
+synced_at moved since the previous poll. A periodic full reload picks up rows
+that were deleted on the warehouse side.
+
+The snapshot also maintains the search index (search_index.py), the facet
+index (facets.py) and the serialized category tree. The tree is rebuilt only
+when a sync touches category fields.
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Category, Product, ProductTag
+from search_index import SearchIndex
+from facets import FacetIndex
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', '1') == '1'
+CATALOG_REFRESH_SECONDS = int(os.getenv('CATALOG_REFRESH_SECONDS', '60'))
+CATALOG_FULL_RELOAD_SECONDS = int(os.getenv('CATALOG_FULL_RELOAD_SECONDS', '3600'))
+
+# Columns kept in memory - everything ProductDetail needs plus sync bookkeeping
+PRODUCT_FIELDS = (
+    'product_id', 'sku', 'name', 'category_id', 'category_name',
+    'subcategory_id', 'subcategory_name', 'description', 'care_instructions',
+    'color', 'material', 'size', 'price', 'rental_price', 'status',
+    'quantity', 'frozen_quantity', 'image_url', 'zone', 'aisle', 'shelf',
+    'synced_at',
+)
+
+# Fields that place a product in the category tree
+TREE_FIELDS = ('status', 'category_id', 'category_name', 'subcategory_id', 'subcategory_name')
+
+CATEGORY_FIELDS = ('category_id', 'name', 'parent_id', 'description', 'sort_order', 'is_active')
+
+
+class CatalogProduct:
+    """Compact read-only product record (attribute-compatible with Product)"""
+    __slots__ = PRODUCT_FIELDS + ('tags', '_category_fold', '_color_fold', '_material_fold')
+
+    def __init__(self, row, tags=()):
+        for field in PRODUCT_FIELDS:
+            setattr(self, field, row[field])
+        self.tags = tuple(tags)
+        # Pre-folded values for case-insensitive filter matching
+        self._category_fold = _fold(self.category_name)
+        self._color_fold = _fold(self.color)
+        self._material_fold = _fold(self.material)
+
+
+def _fold(value: Optional[str]) -> str:
+    return value.casefold() if value else ''
+
+
+class CatalogSnapshot:
+    """In-memory copy of the products table with incremental refresh"""
+
+    def __init__(self):
+        self._products: Dict[int, CatalogProduct] = {}
+        # Active products (status = 1) ordered by product_id DESC, as /products returns them
+        self._active: List[CatalogProduct] = []
+        # Negated ids of self._active - ascending, for bisect on keyset cursors
+        self._active_keys: List[int] = []
+        self._search_index = SearchIndex()
+        self._facets = FacetIndex(())
+        self._categories: List[dict] = []
+        # (json bytes, etag) of /catalog/tree; None - needs rebuild
+        self._tree: Optional[tuple] = None
+        self._load_lock = asyncio.Lock()
+        self._watermark: Optional[datetime] = None
+        self._loaded_at: float = 0.0
+        self.version = 0
+
+    @property
+    def is_ready(self) -> bool:
+        return CATALOG_SNAPSHOT_ENABLED and self.version > 0
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    async def load(self, db: AsyncSession):
+        """Full load of the catalog"""
+        started = time.perf_counter()
+        rows = await self._fetch(db)
+        tags = await self._fetch_tags(db)
+        categories = await db.execute(select(*[getattr(Category, field) for field in CATEGORY_FIELDS]))
+        self._categories = [dict(row) for row in categories.mappings()]
+        self._tree = None
+        self._products = {
+            row['product_id']: CatalogProduct(row, tags.get(row['product_id'], ()))
+            for row in rows
+        }
+        self._search_index = SearchIndex()
+        for product in self._products.values():
+            self._index(product)
+        self._watermark = max((r['synced_at'] for r in rows if r['synced_at']), default=None)
+        self._loaded_at = time.monotonic()
+        self._rebuild()
+        logger.info(
+            f"Catalog snapshot loaded: {len(self._products)} products "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Pull rows whose synced_at moved since the last poll. Returns number of changed rows."""
+        if self.version == 0 or time.monotonic() - self._loaded_at >= CATALOG_FULL_RELOAD_SECONDS:
+            await self.load(db)
+            return len(self._products)
+
+        # >= instead of > so rows synced within the same second as the last poll are not lost
+        rows = await self._fetch(db, since=self._watermark)
+        changed = [
+            row for row in rows
+            if row['product_id'] not in self._products
+            or self._products[row['product_id']].synced_at != row['synced_at']
+        ]
+        if not changed:
+            return 0
+
+        tags = await self._fetch_tags(db, [row['product_id'] for row in changed])
+        for row in changed:
+            previous = self._products.get(row['product_id'])
+            if previous is None or any(getattr(previous, f) != row[f] for f in TREE_FIELDS):
+                self._tree = None
+            product = CatalogProduct(row, tags.get(row['product_id'], ()))
+            self._products[row['product_id']] = product
+            self._index(product)
+            if row['synced_at'] and (self._watermark is None or row['synced_at'] > self._watermark):
+                self._watermark = row['synced_at']
+        self._rebuild()
+        logger.info(f"Catalog snapshot refreshed: {len(changed)} products changed")
+        return len(changed)
+
+    async def _fetch(self, db: AsyncSession, since: Optional[datetime] = None) -> List[dict]:
+        query = select(*[getattr(Product, field) for field in PRODUCT_FIELDS])
+        if since is not None:
+            query = query.where(Product.synced_at >= since)
+        result = await db.execute(query)
+        return [dict(row) for row in result.mappings()]
+
+    async def _fetch_tags(self, db: AsyncSession, product_ids: Optional[List[int]] = None) -> Dict[int, List[str]]:
+        query = select(ProductTag.product_id, ProductTag.tag)
+        if product_ids is not None:
+            query = query.where(ProductTag.product_id.in_(product_ids))
+        result = await db.execute(query)
+        tags: Dict[int, List[str]] = {}
+        for product_id, tag in result.all():
+            tags.setdefault(product_id, []).append(tag)
+        return tags
+
+    def _index(self, product: CatalogProduct):
+        self._search_index.add(product.product_id, {
+            'sku': product.sku,
+            'name': product.name,
+            'tags': product.tags,
+            'category_name': product.category_name,
+            'subcategory_name': product.subcategory_name,
+            'color': product.color,
+            'material': product.material,
+        })
+
+    def _rebuild(self):
+        active = sorted(
+            (p for p in self._products.values() if p.status == 1),
+            key=lambda p: p.product_id,
+            reverse=True
+        )
+        self._active = active
+        self._active_keys = [-p.product_id for p in active]
+        self._facets = FacetIndex(active)
+        self.version += 1
+
+    async def ensure_loaded(self, db: AsyncSession):
+        """Load the snapshot on demand if the background refresh has not done it yet"""
+        if self.version > 0:
+            return
+        async with self._load_lock:
+            if self.version == 0:
+                await self.load(db)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, product_id: int) -> Optional[CatalogProduct]:
+        return self._products.get(product_id)
+
+    def active_products(self, after_id: Optional[int] = None) -> List[CatalogProduct]:
+        """Active products ordered by product_id DESC, optionally starting below after_id"""
+        if after_id is None:
+            return self._active
+        start = bisect.bisect_right(self._active_keys, -after_id)
+        return self._active[start:]
+
+    def search(self, query: str, after_id: Optional[int] = None) -> List[CatalogProduct]:
+        """Active products matching the search query, best match first"""
+        ranked = []
+        for product_id in self._search_index.search(query):
+            product = self._products.get(product_id)
+            if product is None or product.status != 1:
+                continue
+            if after_id is not None and product_id >= after_id:
+                continue
+            ranked.append(product)
+        return ranked
+
+    def filter(
+        self,
+        products: Iterable[CatalogProduct],
+        category_id: Optional[int] = None,
+        category_name: Optional[str] = None,
+        subcategory_name: Optional[str] = None,
+        color: Optional[str] = None,
+        material: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        predicate: Optional[Callable[[CatalogProduct], bool]] = None,
+    ) -> Iterator[CatalogProduct]:
+        """Same semantics as the SQL filters of GET /products (case-insensitive like MySQL collation)"""
+        category_name = _fold(category_name)
+        subcategory_name = _fold(subcategory_name)
+        color = _fold(color)
+        material = _fold(material)
+        min_price = Decimal(str(min_price)) if min_price else None
+        max_price = Decimal(str(max_price)) if max_price else None
+
+        for p in products:
+            if category_id and p.category_id != category_id:
+                continue
+            if category_name and p._category_fold != category_name:
+                continue
+            if subcategory_name and _fold(p.subcategory_name) != subcategory_name:
+                continue
+            if color and color not in p._color_fold:
+                continue
+            if material and material not in p._material_fold:
+                continue
+            if min_price is not None and (p.rental_price is None or p.rental_price < min_price):
+                continue
+            if max_price is not None and (p.rental_price is None or p.rental_price > max_price):
+                continue
+            # Extra caller-side check (e.g. availability on dates), evaluated last as the most expensive
+            if predicate is not None and not predicate(p):
+                continue
+            yield p
+
+    def query(
+        self,
+        skip: int = 0,
+        limit: int = 50,
+        after_id: Optional[int] = None,
+        search: Optional[str] = None,
+        **filters
+    ) -> List[CatalogProduct]:
+        """Filtered page of active products (offset or keyset); ranked by relevance when searching"""
+        if search:
+            candidates = self.search(search, after_id)
+        else:
+            candidates = self.active_products(after_id)
+        matches = self.filter(candidates, **filters)
+        return list(islice(matches, skip, skip + limit))
+
+    def facets(
+        self,
+        search: Optional[str] = None,
+        category_id: Optional[int] = None,
+        category_name: Optional[str] = None,
+        subcategory_name: Optional[str] = None,
+        color: Optional[str] = None,
+        material: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> dict:
+        """Facet counts and price range for a GET /products filter state"""
+        base_ids = self._facets.all_ids
+        if search:
+            base_ids = base_ids & set(self._search_index.search(search))
+        if category_id:
+            base_ids = base_ids & self._facets.by_category_id(category_id)
+        return self._facets.counts(
+            base_ids,
+            {
+                'category_name': category_name,
+                'subcategory_name': subcategory_name,
+                'color': color,
+                'material': material,
+            },
+            min_price=min_price,
+            max_price=max_price,
+        )
+
+    def categories(self, parent_id: Optional[int] = None) -> List[dict]:
+        """Active categories of one level, as GET /categories returns them"""
+        categories = [
+            c for c in self._categories
+            if c['is_active'] and c['parent_id'] == parent_id
+        ]
+        return sorted(categories, key=lambda c: (c['sort_order'] or 0, c['name']))
+
+    def category_tree(self) -> tuple:
+        """(json bytes, etag) of the category -> subcategory tree with product counts"""
+        if self._tree is None:
+            self._tree = build_category_tree(self._active, self._categories)
+        return self._tree
+
+    def subcategory_pairs(self, category_name: Optional[str] = None) -> List[tuple]:
+        """Distinct (category_name, subcategory_name) over active products"""
+        pairs = set()
+        for p in self._active:
+            if not p.category_name or not p.subcategory_name:
+                continue
+            if category_name and p.category_name != category_name:
+                continue
+            pairs.add((p.category_name, p.subcategory_name))
+        return list(pairs)
+
+
+def build_category_tree(products: Iterable, categories: List[dict]) -> tuple:
+    """(json bytes, etag) of the category -> subcategory tree over active products"""
+    sort_orders = {c['category_id']: c['sort_order'] or 0 for c in categories}
+    tree: Dict[str, dict] = {}
+    for p in products:
+        if not p.category_name:
+            continue
+        node = tree.get(p.category_name)
+        if node is None:
+            node = tree[p.category_name] = {
+                'category': p.category_name,
+                'category_id': p.category_id,
+                'count': 0,
+                'subcategories': {},
+            }
+        node['count'] += 1
+        if p.subcategory_name:
+            sub = node['subcategories'].get(p.subcategory_name)
+            if sub is None:
+                sub = node['subcategories'][p.subcategory_name] = {
+                    'name': p.subcategory_name,
+                    'subcategory_id': p.subcategory_id,
+                    'count': 0,
+                }
+            sub['count'] += 1
+
+    nodes = sorted(tree.values(), key=lambda n: (sort_orders.get(n['category_id'], 0), n['category']))
+    for node in nodes:
+        node['subcategories'] = sorted(node['subcategories'].values(), key=lambda s: s['name'])
+
+    body = json.dumps(nodes, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    return body, etag
+
+
+catalog = CatalogSnapshot()
+
+
+async def run_catalog_refresh(session_factory):
+    """Background loop: initial load, then incremental refresh every CATALOG_REFRESH_SECONDS"""
+    while True:
+        try:
+            async with session_factory() as db:
+                await catalog.refresh(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Catalog snapshot refresh failed: {e}")
+        await asyncio.sleep(CATALOG_REFRESH_SECONDS)
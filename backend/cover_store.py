@@ -0,0 +1,148 @@
+"""
+Content-addressed store for board cover images.
+
+An uploaded cover is streamed to disk while it is hashed; its SHA-256 is the
+key. Resized WebP variants are rendered once per key into
+COVER_STORE_PATH/<key[:2]>/<key>/<variant>.webp, so identical uploads share
+files and a key never changes content - variants can be cached forever.
+EventBoard.cover_image stores only 'cover:<key>'.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from typing import Dict, Optional
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from image_limits import CHUNK_SIZE
+
+COVER_STORE_PATH = os.getenv('COVER_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'covers'))
+COVER_MAX_BYTES = int(os.getenv('COVER_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# Назва варіанту -> найбільша сторона в пікселях
+COVER_VARIANTS = {
+    'thumb': 320,
+    'card': 800,
+    'full': 1600,
+}
+COVER_WEBP_QUALITY = 82
+
+COVER_KEY_PREFIX = 'cover:'
+_KEY = re.compile(r'^[0-9a-f]{64}$')
+
+
+class CoverImageError(ValueError):
+    """Uploaded file is not a usable image"""
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY.match(key))
+
+
+def cover_key(value: Optional[str]) -> Optional[str]:
+    """Store key from an EventBoard.cover_image value (None for legacy URLs)"""
+    if value and value.startswith(COVER_KEY_PREFIX):
+        key = value[len(COVER_KEY_PREFIX):]
+        if is_valid_key(key):
+            return key
+    return None
+
+
+def variant_path(key: str, variant: str) -> str:
+    return os.path.join(COVER_STORE_PATH, key[:2], key, f"{variant}.webp")
+
+
+def cover_urls(value: Optional[str]) -> Optional[Dict[str, str]]:
+    """Variant name -> path under /api (like products.image_url) for a stored cover"""
+    key = cover_key(value)
+    if key is None:
+        return None
+    return {variant: f"covers/{key}/{variant}.webp" for variant in COVER_VARIANTS}
+
+
+def cover_image_url(value: Optional[str]) -> Optional[str]:
+    """Board cover for API responses: the 'card' variant path, or a legacy value as is"""
+    urls = cover_urls(value)
+    return urls['card'] if urls else value
+
+
+def _decode(source_path: str) -> Image.Image:
+    """Decoded upload with EXIF orientation applied"""
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            return image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, ValueError, OSError):
+        # Pillow повідомляє про обрізані / пошкоджені дані як OSError; джерело - щойно записаний
+        # тимчасовий файл, тож тут це помилка формату, а не диска
+        raise CoverImageError("Unsupported or damaged image")
+
+
+def _render_variants(source_path: str, key: str):
+    """Decode the upload and write all variants (runs in a worker thread)"""
+    image = _decode(source_path)
+
+    target_dir = os.path.dirname(variant_path(key, 'card'))
+    os.makedirs(target_dir, exist_ok=True)
+
+    # Помилки запису (диск, права) - не проблема зображення: прибрати лише своє і передати далі (500)
+    created = []
+    tmp_path = None
+    try:
+        for variant, size in COVER_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            path = variant_path(key, variant)
+            # Запис через унікальний тимчасовий файл - паралельний запит не побачить половину файлу,
+            # а два потоки з тим самим вмістом не пишуть в один і той самий tmp
+            fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix='.tmp')
+            os.close(fd)
+            resized.save(tmp_path, 'WEBP', quality=COVER_WEBP_QUALITY)
+            existed = os.path.exists(path)
+            os.replace(tmp_path, path)
+            tmp_path = None
+            if not existed:
+                created.append(path)
+    except Exception:
+        for path in filter(None, [tmp_path, *created]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        raise
+
+
+async def save_cover(upload: UploadFile) -> str:
+    """Stream an upload into the store; returns the EventBoard.cover_image value"""
+    os.makedirs(COVER_STORE_PATH, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=COVER_STORE_PATH, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > COVER_MAX_BYTES:
+                    raise CoverImageError(f"Image is larger than {COVER_MAX_BYTES // (1024 * 1024)} MB")
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if size == 0:
+            raise CoverImageError("Empty file")
+
+        key = digest.hexdigest()
+        # Такий самий файл уже завантажували - варіанти є
+        if not all(os.path.exists(variant_path(key, variant)) for variant in COVER_VARIANTS):
+            await asyncio.to_thread(_render_variants, tmp_path, key)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return f"{COVER_KEY_PREFIX}{key}"
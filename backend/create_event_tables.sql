@@ -25,6 +25,7 @@ CREATE TABLE IF NOT EXISTS event_boards (
     budget DECIMAL(10, 2),
     estimated_total DECIMAL(10, 2) DEFAULT 0.00,
     canvas_layout JSON,  -- Layout for visual moodboard
+    canvas_revision INT NOT NULL DEFAULT 0,  -- optimistic concurrency for canvas_layout patches
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     converted_to_order_id INT,
@@ -67,6 +68,7 @@ CREATE TABLE IF NOT EXISTS soft_reservations (
     FOREIGN KEY (board_id) REFERENCES event_boards(id) ON DELETE CASCADE,
     FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
     FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE,
+    UNIQUE KEY uq_soft_board_product (board_id, product_id),
     INDEX idx_board (board_id),
     INDEX idx_product_dates (product_id, reserved_from, reserved_until),
     INDEX idx_expires (expires_at),
@@ -0,0 +1,127 @@
+"""
+Precomputed facet index over the active catalog.
+
+For every facet (category, subcategory, color, material) each value maps to
+the set of product IDs that carry it, and prices are kept in a sorted array.
+Facet counts for a filter state are then plain set intersections, so one
+call answers all facets without a GROUP BY per facet.
+"""
+import bisect
+from decimal import Decimal
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+FACET_FIELDS = ('category_name', 'subcategory_name', 'color', 'material')
+
+# Фільтри color/material працюють як LIKE '%q%', category/subcategory - як точний збіг
+CONTAINS_FACETS = ('color', 'material')
+
+
+class FacetIndex:
+    """Value -> product ID sets per facet plus a price-sorted array"""
+
+    def __init__(self, products: Iterable):
+        self._values: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FACET_FIELDS}
+        self._category_ids: Dict[int, Set[int]] = {}
+        prices = []
+
+        ids = set()
+        for p in products:
+            ids.add(p.product_id)
+            for field in FACET_FIELDS:
+                value = getattr(p, field)
+                if value:
+                    self._values[field].setdefault(value, set()).add(p.product_id)
+            if p.category_id:
+                self._category_ids.setdefault(p.category_id, set()).add(p.product_id)
+            if p.rental_price is not None:
+                prices.append((p.rental_price, p.product_id))
+
+        self.all_ids: FrozenSet[int] = frozenset(ids)
+        prices.sort()
+        self._prices: List[Decimal] = [price for price, _ in prices]
+        self._price_ids: List[int] = [product_id for _, product_id in prices]
+
+    def matching(self, field: str, query: str) -> Set[int]:
+        """IDs whose facet value matches a filter value (case-insensitive)"""
+        query = query.casefold()
+        ids: Set[int] = set()
+        for value, value_ids in self._values[field].items():
+            folded = value.casefold()
+            if (query in folded) if field in CONTAINS_FACETS else (query == folded):
+                ids |= value_ids
+        return ids
+
+    def by_category_id(self, category_id: int) -> Set[int]:
+        return self._category_ids.get(category_id, set())
+
+    def by_price(self, min_price: Optional[float], max_price: Optional[float]) -> Set[int]:
+        lo = bisect.bisect_left(self._prices, Decimal(str(min_price))) if min_price else 0
+        hi = bisect.bisect_right(self._prices, Decimal(str(max_price))) if max_price else len(self._prices)
+        return set(self._price_ids[lo:hi])
+
+    def price_range(self, ids: Set[int]) -> tuple:
+        """(min, max) rental price among ids"""
+        low = high = None
+        for i, product_id in enumerate(self._price_ids):
+            if product_id in ids:
+                low = self._prices[i]
+                break
+        for i in range(len(self._price_ids) - 1, -1, -1):
+            if self._price_ids[i] in ids:
+                high = self._prices[i]
+                break
+        return low, high
+
+    def counts(
+        self,
+        base_ids: Set[int],
+        selected: Dict[str, Optional[str]],
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> dict:
+        """
+        Facet counts for a filter state.
+        Each facet is counted with every filter applied except its own, so the
+        UI can show how many products switching to another value would give.
+        """
+        selected_ids = {
+            field: self.matching(field, value)
+            for field, value in selected.items() if value
+        }
+
+        priced = base_ids
+        if min_price or max_price:
+            priced = base_ids & self.by_price(min_price, max_price)
+
+        facets = {}
+        for field in FACET_FIELDS:
+            ids = priced
+            for other, other_ids in selected_ids.items():
+                if other != field:
+                    ids = ids & other_ids
+            entries = []
+            for value, value_ids in self._values[field].items():
+                count = len(value_ids & ids)
+                if count:
+                    entries.append({'value': value, 'count': count})
+            entries.sort(key=lambda entry: (-entry['count'], entry['value']))
+            facets[field] = entries
+
+        matched = priced
+        unpriced = base_ids
+        for other_ids in selected_ids.values():
+            matched = matched & other_ids
+            unpriced = unpriced & other_ids
+
+        # Діапазон цін - без власного фільтра ціни, щоб слайдер показував усі варіанти
+        price_min, price_max = self.price_range(unpriced)
+
+        return {
+            'total': len(matched),
+            'categories': facets['category_name'],
+            'subcategories': facets['subcategory_name'],
+            'colors': facets['color'],
+            'materials': facets['material'],
+            'price_min': price_min,
+            'price_max': price_max,
+        }
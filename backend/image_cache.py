@@ -0,0 +1,293 @@
+"""
+On-disk LRU cache for proxied product images.
+
+Each image is stored as IMAGE_CACHE_PATH/<key[:2]>/<key> (key = SHA-1 of the
+uploads path) with a <key>.json sidecar holding content type and upstream
+validators (ETag / Last-Modified). Files are written to a temporary name and
+renamed into place, so readers never see a partial image.
+
+The index (LRU order and total size) is kept in memory and rebuilt from the
+sidecars at startup. It is only changed on the event loop - the blocking
+file work (rename, sidecars, deletes) is done in worker threads. lookup()
+checks the disk, so files added or evicted by the nightly
+pregenerate_thumbnails.py job are picked up without a restart. Entries
+older than IMAGE_CACHE_REVALIDATE_SECONDS are revalidated upstream with a
+conditional GET before they are served again.
+
+IMAGE_CACHE_MAX_BYTES is enforced by each process against its own index.
+The server counts what it wrote or looked up. The job loads the full index
+at start, so it evicts against the real disk usage. Temporary files are
+only cleaned up at load once they are old enough, because the other
+process may still be writing them.
+
+Cached files are sent with FileResponse, or - when IMAGE_CACHE_ACCEL_REDIRECT
+is set - handed to nginx with X-Accel-Redirect so nginx serves them with
+sendfile and the app never reads the bytes.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from fastapi.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_ENABLED = os.getenv('IMAGE_CACHE_ENABLED', '1') == '1'
+IMAGE_CACHE_PATH = os.getenv('IMAGE_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_cache'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+IMAGE_CACHE_REVALIDATE_SECONDS = int(os.getenv('IMAGE_CACHE_REVALIDATE_SECONDS', '86400'))
+# Внутрішній location nginx, що дивиться на IMAGE_CACHE_PATH (напр. /_image_cache/); порожньо - віддає FastAPI
+IMAGE_CACHE_ACCEL_REDIRECT = os.getenv('IMAGE_CACHE_ACCEL_REDIRECT', '')
+
+BROWSER_CACHE_CONTROL = 'public, max-age=86400'
+
+# Тимчасові файли і файли без sidecar, старші за це, - залишки обірваних записів
+ABANDONED_WRITE_SECONDS = 3600
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_abandoned(path: str, now: float) -> bool:
+    """No process has touched the file for ABANDONED_WRITE_SECONDS"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    # ctime: _install ставить mtime = Last-Modified складу, а ctime - час запису
+    return now - max(st.st_mtime, st.st_ctime) > ABANDONED_WRITE_SECONDS
+
+
+class CacheEntry:
+    __slots__ = ('key', 'size', 'content_type', 'etag', 'last_modified', 'checked_at')
+
+    def __init__(self, key, size, content_type, etag=None, last_modified=None, checked_at=0.0):
+        self.key = key
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked_at = checked_at
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() - self.checked_at < IMAGE_CACHE_REVALIDATE_SECONDS
+
+    def validators(self) -> Dict[str, str]:
+        """Headers for a conditional upstream GET"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_json(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ImageCache:
+    """
+    Size-bounded LRU of image files. The index (_entries, total_bytes) is only
+    read and changed on the event loop; file I/O runs in worker threads.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self.total_bytes = 0
+
+    @staticmethod
+    def key(path: str) -> str:
+        return hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+    def file_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    async def load(self):
+        """Rebuild the index from sidecar files, least recently checked first"""
+        entries = await asyncio.to_thread(self._scan)
+        self._entries = OrderedDict((entry.key, entry) for entry in entries)
+        self.total_bytes = sum(entry.size for entry in entries)
+        await self._evict()
+        logger.info(f"Image cache loaded: {len(self._entries)} files, {self.total_bytes // (1024 * 1024)} MB")
+
+    def _scan(self) -> List[CacheEntry]:
+        now = time.time()
+        entries = []
+        data_files = []
+        if os.path.isdir(self.root):
+            for directory, _, files in os.walk(self.root):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    if name.endswith('.tmp'):
+                        # Свіжий .tmp може дописувати інший процес (pregenerate_thumbnails.py)
+                        if _is_abandoned(path, now):
+                            self._remove_file(path)
+                        continue
+                    if not name.endswith('.json'):
+                        data_files.append(path)
+                        continue
+                    try:
+                        with open(path) as f:
+                            entry = CacheEntry(**json.load(f))
+                        entry.size = os.path.getsize(self.file_path(entry.key))
+                    except (OSError, ValueError, TypeError):
+                        self._delete_files(name[:-len('.json')])
+                        continue
+                    entries.append(entry)
+
+        # Файли без sidecar (обірваний запис) - видалити, якщо це не запис, що саме триває
+        known = {entry.key for entry in entries}
+        for path in data_files:
+            if os.path.basename(path) not in known and _is_abandoned(path, now):
+                self._remove_file(path)
+
+        entries.sort(key=lambda entry: entry.checked_at)
+        return entries
+
+    def get(self, path: str) -> Optional[CacheEntry]:
+        """Entry from the in-memory index only"""
+        entry = self._entries.get(self.key(path))
+        if entry is not None:
+            self._entries.move_to_end(entry.key)
+        return entry
+
+    async def lookup(self, path: str) -> Optional[CacheEntry]:
+        """
+        Entry for path checked against the disk: a file written by another process
+        (pregenerate_thumbnails.py) is added to the index, a file deleted by one is
+        dropped from it.
+        """
+        entry = self.get(path)
+        if entry is not None:
+            if await asyncio.to_thread(os.path.exists, self.file_path(entry.key)):
+                return entry
+            self._entries.pop(entry.key, None)
+            self.total_bytes -= entry.size
+            return None
+
+        entry = await asyncio.to_thread(self._read_entry, self.key(path))
+        if entry is None:
+            return None
+        # Могли додати паралельно, поки читали sidecar
+        old = self._entries.pop(entry.key, None)
+        if old is not None:
+            self.total_bytes -= old.size
+        self._entries[entry.key] = entry
+        self.total_bytes += entry.size
+        await self._evict()
+        return self._entries.get(entry.key)
+
+    def _read_entry(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self.file_path(key) + '.json') as f:
+                entry = CacheEntry(**json.load(f))
+            entry.size = os.path.getsize(self.file_path(key))
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry
+
+    def temp_file(self):
+        """Open a temporary file inside the cache (same filesystem, so commit is a rename; blocking)"""
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    async def commit(
+        self,
+        path: str,
+        tmp_path: str,
+        content_type: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> CacheEntry:
+        """Move a fully written temporary file into place as the entry for path"""
+        key = self.key(path)
+        entry = CacheEntry(key, 0, content_type, etag, last_modified, time.time())
+        entry.size = await asyncio.to_thread(self._install, tmp_path, entry)
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old.size
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        await self._evict()
+        return entry
+
+    def _install(self, tmp_path: str, entry: CacheEntry) -> int:
+        target = self.file_path(entry.key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        # mtime = Last-Modified складу: повторне завантаження того самого файлу
+        # не робить зменшені копії (image_variants.is_current) застарілими
+        modified_at = _http_date(entry.last_modified)
+        if modified_at is not None:
+            os.utime(target, (modified_at, modified_at))
+        entry.size = os.path.getsize(target)
+        self._write_meta(entry)
+        return entry.size
+
+    async def touch(self, entry: CacheEntry):
+        """Upstream confirmed the entry (304) - fresh again"""
+        entry.checked_at = time.time()
+        await asyncio.to_thread(self._write_meta, entry)
+
+    async def remove(self, path: str):
+        entry = self._entries.pop(self.key(path), None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+            await asyncio.to_thread(self._delete_files, entry.key)
+
+    def _write_meta(self, entry: CacheEntry):
+        meta_path = self.file_path(entry.key) + '.json'
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(meta_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry.to_json(), f)
+        os.replace(tmp_path, meta_path)
+
+    def _delete_files(self, key: str):
+        for path in (self.file_path(key), self.file_path(key) + '.json'):
+            self._remove_file(path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def _evict(self):
+        evicted = []
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            evicted.append(entry.key)
+        for key in evicted:
+            await asyncio.to_thread(self._delete_files, key)
+
+    def response(self, entry: CacheEntry) -> Response:
+        headers = {'Cache-Control': BROWSER_CACHE_CONTROL}
+        if entry.etag:
+            headers['ETag'] = entry.etag
+        if IMAGE_CACHE_ACCEL_REDIRECT:
+            headers['X-Accel-Redirect'] = f"{IMAGE_CACHE_ACCEL_REDIRECT.rstrip('/')}/{entry.key[:2]}/{entry.key}"
+            return Response(media_type=entry.content_type, headers=headers)
+        return FileResponse(self.file_path(entry.key), media_type=entry.content_type, headers=headers)
+
+
+image_cache = ImageCache(IMAGE_CACHE_PATH, IMAGE_CACHE_MAX_BYTES)
@@ -0,0 +1,12 @@
+"""
+Limits shared by the image modules (cover_store.py, image_variants.py,
+image_proxy.py). Importing this module applies the Pillow pixel limit.
+"""
+from PIL import Image
+
+# Не розпаковувати "бомби" на сотні мегапікселів
+MAX_IMAGE_PIXELS = 40_000_000
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Шматок при потоковому читанні / записі файлів зображень
+CHUNK_SIZE = 64 * 1024
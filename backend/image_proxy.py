@@ -0,0 +1,297 @@
+"""
+Proxy for product images that live on the warehouse server.
+
+Used when the warehouse uploads directory is not mounted locally. One
+application-lifetime httpx client (HTTP/2, keep-alive, bounded pool) is
+shared by all requests, so a product grid reuses a few connections instead
+of opening a TLS connection per image.
+
+Images are looked up on several mirrors. The mirror that last served a
+path prefix (e.g. uploads/products) is tried first for that prefix, and a
+mirror that failed to connect is skipped for a cooldown period.
+
+Upstream bodies are streamed, never buffered whole. With the disk cache
+enabled, concurrent requests for one path share a single ImageDownload: the
+body is written to the cache's temporary file as it arrives and every waiting
+request streams from that file, so N viewers cost one upstream fetch. Paths
+that every mirror answered with 404 are remembered for
+IMAGE_NOT_FOUND_TTL_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import posixpath
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from image_cache import image_cache, CacheEntry
+from image_limits import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+PRODUCTION_BACKEND_URL = os.getenv('PRODUCTION_BACKEND_URL', 'https://backrentalhub.farforrent.com.ua')
+
+# Порядок за замовчуванням; однакові адреси пробуються один раз
+IMAGE_MIRRORS = list(dict.fromkeys([
+    PRODUCTION_BACKEND_URL,
+    'https://backrentalhub.farforrent.com.ua',
+    'https://www.farforrent.com.ua',
+]))
+
+IMAGE_PROXY_HTTP2 = os.getenv('IMAGE_PROXY_HTTP2', '1') == '1'
+IMAGE_PROXY_MAX_CONNECTIONS = int(os.getenv('IMAGE_PROXY_MAX_CONNECTIONS', '20'))
+IMAGE_PROXY_TIMEOUT_SECONDS = float(os.getenv('IMAGE_PROXY_TIMEOUT_SECONDS', '10'))
+IMAGE_MIRROR_COOLDOWN_SECONDS = int(os.getenv('IMAGE_MIRROR_COOLDOWN_SECONDS', '60'))
+IMAGE_NOT_FOUND_TTL_SECONDS = int(os.getenv('IMAGE_NOT_FOUND_TTL_SECONDS', '300'))
+IMAGE_NOT_FOUND_MAX_ENTRIES = 10000
+
+# Результат запиту до дзеркал
+FOUND = 'found'
+NOT_MODIFIED = 'not_modified'
+NOT_FOUND = 'not_found'
+ERROR = 'error'
+
+
+def _write_chunk(f, chunk: bytes):
+    f.write(chunk)
+    # Читачі body() відкривають той самий файл - дані мають бути в ОС, а не в буфері
+    f.flush()
+
+
+def _discard(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ImageDownloadError(Exception):
+    """Upstream body was cut off after streaming had started"""
+
+
+class ImageDownload:
+    """One upstream fetch of a path, shared by every request that waits for it"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.result: Optional[str] = None
+        self.content_type = 'application/octet-stream'
+        self.etag: Optional[str] = None
+        self.tmp_path: Optional[str] = None
+        self.cached_path: Optional[str] = None
+        self.size = 0
+        self.finished = False
+        self.failed = False
+        self._started = asyncio.Event()
+        self._progress = asyncio.Condition()
+
+    async def wait(self) -> str:
+        """Wait until the upstream answered; FOUND, NOT_MODIFIED, NOT_FOUND or ERROR"""
+        await self._started.wait()
+        return self.result
+
+    async def complete(self) -> bool:
+        """Wait for the whole body; True if it is now in the disk cache"""
+        if await self.wait() != FOUND:
+            return False
+        async with self._progress:
+            await self._progress.wait_for(lambda: self.finished or self.failed)
+        return self.finished
+
+    def body(self):
+        """
+        Async iterator over the body from the first byte, following the download
+        while it is in progress. Once opened, the reader is not affected by the
+        commit (rename) of the temporary file.
+        """
+        try:
+            f = open(self.cached_path or self.tmp_path, 'rb')
+        except FileNotFoundError:
+            # commit уже перейменував тимчасовий файл
+            f = open(image_cache.file_path(image_cache.key(self.path)), 'rb')
+        return self._read(f)
+
+    async def _read(self, f):
+        with f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if chunk:
+                    yield chunk
+                    continue
+                if self.failed:
+                    raise ImageDownloadError(self.path)
+                if self.finished:
+                    return
+                offset = f.tell()
+                async with self._progress:
+                    await self._progress.wait_for(lambda: self.size > offset or self.finished or self.failed)
+
+    async def _notify(self):
+        async with self._progress:
+            self._progress.notify_all()
+
+    async def run(self, proxy: 'ImageProxy', entry: Optional[CacheEntry]):
+        tmp_path = None
+        try:
+            self.result, response = await proxy.open(self.path, entry.validators() if entry else None)
+
+            if self.result == NOT_MODIFIED and entry is not None:
+                await image_cache.touch(entry)
+            elif self.result == NOT_FOUND and entry is not None:
+                # Зображення видалили на складі
+                await image_cache.remove(self.path)
+            if self.result != FOUND:
+                return
+
+            self.content_type = response.headers.get('content-type', self.content_type)
+            self.etag = response.headers.get('etag')
+            last_modified = response.headers.get('last-modified')
+            try:
+                tmp, tmp_path = await asyncio.to_thread(image_cache.temp_file)
+                self.tmp_path = tmp_path
+                # Заголовки відомі - запити вже можуть читати тіло з файлу
+                self._started.set()
+                with tmp:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        await asyncio.to_thread(_write_chunk, tmp, chunk)
+                        self.size += len(chunk)
+                        await self._notify()
+            finally:
+                await response.aclose()
+
+            entry = await image_cache.commit(self.path, tmp_path, self.content_type, self.etag, last_modified)
+            self.cached_path = image_cache.file_path(entry.key)
+            self.finished = True
+        except Exception as e:
+            self.failed = True
+            if not self._started.is_set():
+                self.result = ERROR
+            logger.warning(f"Image download failed for {self.path}: {e!r}")
+            if tmp_path:
+                await asyncio.to_thread(_discard, tmp_path)
+        finally:
+            proxy._downloads.pop(self.path, None)
+            self._started.set()
+            await self._notify()
+
+
+class ImageProxy:
+    """Shared upstream client with per-prefix mirror preference"""
+
+    def __init__(self, mirrors: List[str]):
+        self.mirrors = mirrors
+        self.client: Optional[httpx.AsyncClient] = None
+        # path prefix -> index of the mirror that served it last
+        self._preferred: Dict[str, int] = {}
+        # mirror index -> monotonic time until which it is skipped
+        self._down_until: Dict[int, float] = {}
+        # path -> monotonic time until which it is answered 404 without asking mirrors
+        self._not_found: 'OrderedDict[str, float]' = OrderedDict()
+        # path -> download in progress
+        self._downloads: Dict[str, ImageDownload] = {}
+        self._tasks = set()
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            http2=IMAGE_PROXY_HTTP2,
+            limits=httpx.Limits(
+                max_connections=IMAGE_PROXY_MAX_CONNECTIONS,
+                max_keepalive_connections=IMAGE_PROXY_MAX_CONNECTIONS,
+                keepalive_expiry=60
+            ),
+            timeout=httpx.Timeout(IMAGE_PROXY_TIMEOUT_SECONDS, connect=3.0),
+            follow_redirects=True
+        )
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    @staticmethod
+    def prefix(path: str) -> str:
+        return posixpath.dirname(path)
+
+    def _mirror_order(self, path: str) -> List[int]:
+        """Mirror indexes to try: mirrors in cooldown are skipped (unless all are), preferred one first"""
+        now = time.monotonic()
+        order = [index for index in range(len(self.mirrors)) if self._down_until.get(index, 0) <= now]
+        if not order:
+            order = list(range(len(self.mirrors)))
+        preferred = self._preferred.get(self.prefix(path))
+        if preferred in order:
+            order.remove(preferred)
+            order.insert(0, preferred)
+        return order
+
+    def is_missing(self, path: str) -> bool:
+        expires = self._not_found.get(path)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del self._not_found[path]
+            return False
+        return True
+
+    def _remember_missing(self, path: str):
+        self._not_found[path] = time.monotonic() + IMAGE_NOT_FOUND_TTL_SECONDS
+        self._not_found.move_to_end(path)
+        while len(self._not_found) > IMAGE_NOT_FOUND_MAX_ENTRIES:
+            self._not_found.popitem(last=False)
+
+    async def open(
+        self, path: str, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[str, Optional[httpx.Response]]:
+        """
+        GET uploads/<path> from the first mirror that has it, without reading the body.
+        Returns (FOUND, streaming response - caller must aclose it), (NOT_MODIFIED, None)
+        for a conditional request, (NOT_FOUND, None) when every mirror answered 404,
+        or (ERROR, None) when a mirror could not answer.
+        """
+        if self.client is None:
+            await self.start()
+
+        failed = False
+        for index in self._mirror_order(path):
+            try:
+                request = self.client.build_request('GET', f"{self.mirrors[index]}/uploads/{path}", headers=headers)
+                response = await self.client.send(request, stream=True)
+            except httpx.TransportError as e:
+                self._down_until[index] = time.monotonic() + IMAGE_MIRROR_COOLDOWN_SECONDS
+                logger.warning(f"Image mirror {self.mirrors[index]} failed: {e!r}")
+                failed = True
+                continue
+
+            self._down_until.pop(index, None)
+            if response.status_code == 200:
+                self._preferred[self.prefix(path)] = index
+                return FOUND, response
+
+            await response.aclose()
+            if response.status_code == 304:
+                self._preferred[self.prefix(path)] = index
+                return NOT_MODIFIED, None
+            if response.status_code != 404:
+                failed = True
+
+        if failed:
+            return ERROR, None
+        self._remember_missing(path)
+        return NOT_FOUND, None
+
+    def download(self, path: str, entry: Optional[CacheEntry] = None) -> ImageDownload:
+        """Download of path into the disk cache - the one in progress, or a new one"""
+        download = self._downloads.get(path)
+        if download is None:
+            download = ImageDownload(path)
+            self._downloads[path] = download
+            task = asyncio.create_task(download.run(self, entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return download
+
+
+image_proxy = ImageProxy(IMAGE_MIRRORS)
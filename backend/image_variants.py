@@ -0,0 +1,202 @@
+"""
+Resized variants of product images for /api/img/{w}x{h}/{path}.
+
+A variant is rendered once in a process pool (decoding and resampling a
+large PNG takes tens of milliseconds of CPU - too long for the event loop and
+the GIL), encoded to WebP and stored as
+IMAGE_VARIANTS_PATH/<key[:2]>/<key>/<w>x<h>.<format> (key = SHA-1 of the
+uploads path). A variant older than its source file is rendered again.
+
+Only the sizes listed in IMAGE_VARIANT_SIZES are served, so a client can not
+fill the disk with arbitrary dimensions. Product uploads get a new file name
+(with a timestamp) when the picture changes, so variants are sent as
+immutable. AVIF is produced instead of WebP for clients that accept it when
+IMAGE_VARIANT_AVIF=1 (smaller files, noticeably slower to encode).
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi.responses import FileResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from image_cache import image_cache, IMAGE_CACHE_ENABLED
+import image_limits  # noqa: F401 - ліміт пікселів Pillow, зокрема у процесах пулу
+from image_proxy import image_proxy, FOUND, NOT_FOUND, ERROR
+
+# Папка uploads складу (на production сервері змонтована як /uploads); інакше зображення проксуються
+UPLOADS_PATH = os.getenv('UPLOADS_PATH', "/home/farforre/farforrent.com.ua/rentalhub/backend/uploads")
+
+IMAGE_VARIANTS_PATH = os.getenv('IMAGE_VARIANTS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_variants'))
+IMAGE_RESIZE_WORKERS = int(os.getenv('IMAGE_RESIZE_WORKERS', str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+IMAGE_VARIANT_AVIF = os.getenv('IMAGE_VARIANT_AVIF', '0') == '1'
+
+
+def _parse_sizes(value: str) -> Set[Tuple[int, int]]:
+    sizes = set()
+    for item in value.split(','):
+        width, _, height = item.strip().partition('x')
+        if width.isdigit() and height.isdigit():
+            sizes.add((int(width), int(height)))
+    return sizes
+
+
+# Розміри карток каталогу і сайдбару мудборду (1x і 2x)
+IMAGE_VARIANT_SIZES = _parse_sizes(os.getenv('IMAGE_VARIANT_SIZES', '160x160,320x320,480x360,960x720'))
+
+VARIANT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+VARIANT_MEDIA_TYPES = {
+    'webp': 'image/webp',
+    'avif': 'image/avif',
+}
+
+
+class ImageVariantError(ValueError):
+    """Source file is not a usable image"""
+
+
+def local_upload(full_path: str) -> Optional[str]:
+    """File for uploads/<full_path> in the mounted UPLOADS_PATH (None if missing or outside it)"""
+    root = os.path.realpath(UPLOADS_PATH)
+    source_path = os.path.realpath(os.path.join(root, full_path))
+    if source_path.startswith(root + os.sep) and os.path.isfile(source_path):
+        return source_path
+    return None
+
+
+async def upload_source(full_path: str) -> Tuple[str, Optional[str]]:
+    """
+    Local file with the original of uploads/<full_path>: the mounted uploads, or
+    the disk cache of the image proxy (downloaded if missing or stale).
+    Returns (FOUND, path), (NOT_FOUND, None), or (ERROR, None) when the mirrors
+    failed and nothing is cached.
+    """
+    if os.path.exists(UPLOADS_PATH):
+        source_path = local_upload(full_path)
+        return (FOUND, source_path) if source_path else (NOT_FOUND, None)
+
+    if not IMAGE_CACHE_ENABLED:
+        return ERROR, None
+    if image_proxy.is_missing(full_path):
+        return NOT_FOUND, None
+
+    entry = await image_cache.lookup(full_path)
+    if entry is None or not entry.is_fresh:
+        download = image_proxy.download(full_path, entry)
+        await download.complete()
+        if download.result == NOT_FOUND:
+            return NOT_FOUND, None
+        # Завантажено, 304, або дзеркала недоступні - наявна (можливо застаріла) копія
+        entry = await image_cache.lookup(full_path)
+    if entry is None:
+        return ERROR, None
+    return FOUND, image_cache.file_path(entry.key)
+
+
+def variant_path(path: str, width: int, height: int, fmt: str = 'webp') -> str:
+    key = hashlib.sha1(path.encode('utf-8')).hexdigest()
+    return os.path.join(IMAGE_VARIANTS_PATH, key[:2], key, f"{width}x{height}.{fmt}")
+
+
+def is_current(source_path: str, target_path: str) -> bool:
+    """Variant exists and is not older than its source"""
+    try:
+        return os.path.getmtime(target_path) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
+
+
+def render_variants(source_path: str, targets: List[Tuple[str, int, int, str]]) -> int:
+    """
+    Decode the image once and write every (target_path, width, height, format),
+    each scaled down to cover width x height (the UI crops with object-fit:
+    cover); returns the total size in bytes. Runs in a worker process.
+    """
+    tmp_path = None
+    total = 0
+    try:
+        with Image.open(source_path) as image:
+            # JPEG: декодувати одразу в зменшеному масштабі (не менше потрібного з обох боків)
+            largest = max(max(width, height) for _, width, height, _ in targets)
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P', 'PA') else 'RGB')
+
+            for target_path, width, height, fmt in targets:
+                scale = max(width / image.width, height / image.height)
+                resized = image
+                if scale < 1:
+                    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                    resized = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                tmp_path = f"{target_path}.{os.getpid()}.tmp"
+                resized.save(tmp_path, fmt.upper(), quality=IMAGE_VARIANT_QUALITY)
+                os.replace(tmp_path, target_path)
+                tmp_path = None
+                total += os.path.getsize(target_path)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise ImageVariantError(f"Can not render {source_path}: {e}")
+    return total
+
+
+def render_variant(source_path: str, target_path: str, width: int, height: int, fmt: str = 'webp') -> int:
+    return render_variants(source_path, [(target_path, width, height, fmt)])
+
+
+def variant_format(accept: Optional[str]) -> str:
+    if IMAGE_VARIANT_AVIF and accept and 'image/avif' in accept:
+        return 'avif'
+    return 'webp'
+
+
+class VariantRenderer:
+    """Process pool plus coalescing of concurrent renders of the same variant"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # target path -> render in progress
+        self._rendering: Dict[str, asyncio.Future] = {}
+
+    def start(self):
+        if self._pool is None:
+            # spawn: не форкати процес із запущеним event loop і потоками
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def variant(self, path: str, source_path: str, width: int, height: int, fmt: str = 'webp') -> str:
+        """Path of an up-to-date variant file, rendering it if needed"""
+        target_path = variant_path(path, width, height, fmt)
+        if await asyncio.to_thread(is_current, source_path, target_path):
+            return target_path
+
+        future = self._rendering.get(target_path)
+        if future is None:
+            self.start()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._pool, render_variant, source_path, target_path, width, height, fmt)
+            self._rendering[target_path] = future
+            future.add_done_callback(lambda _: self._rendering.pop(target_path, None))
+        await asyncio.shield(future)
+        return target_path
+
+
+def variant_response(target_path: str, fmt: str) -> FileResponse:
+    headers = {'Cache-Control': VARIANT_CACHE_CONTROL}
+    if IMAGE_VARIANT_AVIF:
+        headers['Vary'] = 'Accept'
+    return FileResponse(target_path, media_type=VARIANT_MEDIA_TYPES[fmt], headers=headers)
+
+
+variant_renderer = VariantRenderer(IMAGE_RESIZE_WORKERS)
@@ -0,0 +1,122 @@
+"""
+Minimal JSON Patch (RFC 6902) for board canvas layouts.
+
+Supports add, remove, replace, move, copy and test with JSON Pointer paths
+(RFC 6901). The patch is applied to a deep copy of the document, so an
+operation that fails leaves the original untouched.
+"""
+import copy
+from typing import Any, Iterable, List
+
+_MISSING = object()
+
+
+class JsonPatchError(ValueError):
+    """Operation can not be applied to the document"""
+
+
+def _tokens(path: str) -> List[str]:
+    if path == '':
+        return []
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise JsonPatchError(f"Invalid JSON pointer: {path!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+
+def _index(array: list, token: str, path: str, allow_end: bool = False) -> int:
+    """Array index from a pointer token ('-' means after the last element when allow_end)"""
+    if allow_end and token == '-':
+        return len(array)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index in {path!r}")
+    index = int(token)
+    if index > len(array) or (index == len(array) and not allow_end):
+        raise JsonPatchError(f"Array index out of range in {path!r}")
+    return index
+
+
+def _walk(document: Any, tokens: List[str], path: str) -> Any:
+    node = document
+    for token in tokens:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f"Path not found: {path!r}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token, path)]
+        else:
+            raise JsonPatchError(f"Path not found: {path!r}")
+    return node
+
+
+def _get(document: Any, path: str) -> Any:
+    return _walk(document, _tokens(path), path)
+
+
+def _add(document: Any, path: str, value: Any) -> Any:
+    tokens = _tokens(path)
+    if not tokens:
+        return value
+    parent = _walk(document, tokens[:-1], path)
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, tokens[-1], path, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Path not found: {path!r}")
+    return document
+
+
+def _remove(document: Any, path: str) -> Any:
+    """Remove the value at path; returns the removed value"""
+    tokens = _tokens(path)
+    if not tokens:
+        raise JsonPatchError("Can not remove the document root")
+    parent = _walk(document, tokens[:-1], path)
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JsonPatchError(f"Path not found: {path!r}")
+        return parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, tokens[-1], path))
+    raise JsonPatchError(f"Path not found: {path!r}")
+
+
+def apply_patch(document: Any, operations: Iterable[dict]) -> Any:
+    """Return a patched copy of document. Each operation is {'op', 'path', 'value'?, 'from'?}."""
+    document = copy.deepcopy(document)
+
+    for operation in operations:
+        op = operation.get('op')
+        path = operation.get('path')
+        value = operation.get('value', _MISSING)
+
+        if op in ('add', 'replace', 'test') and value is _MISSING:
+            raise JsonPatchError(f"'{op}' operation requires 'value'")
+
+        if op == 'add':
+            document = _add(document, path, copy.deepcopy(value))
+        elif op == 'remove':
+            _remove(document, path)
+        elif op == 'replace':
+            if _tokens(path):
+                _remove(document, path)
+            document = _add(document, path, copy.deepcopy(value))
+        elif op in ('move', 'copy'):
+            source = operation.get('from')
+            if source is None:
+                raise JsonPatchError(f"'{op}' operation requires 'from'")
+            if op == 'move':
+                if path != source and path.startswith(source + '/'):
+                    raise JsonPatchError("Can not move a value into one of its children")
+                moved = _remove(document, source) if _tokens(source) else document
+            else:
+                moved = copy.deepcopy(_get(document, source))
+            document = _add(document, path, moved)
+        elif op == 'test':
+            if _get(document, path) != value:
+                raise JsonPatchError(f"Test failed at {path!r}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+
+    return document
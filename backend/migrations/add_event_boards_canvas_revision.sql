@@ -0,0 +1,3 @@
+-- Revision of canvas_layout for PATCH /boards/{id}/canvas-layout (optimistic concurrency)
+ALTER TABLE event_boards
+ADD COLUMN IF NOT EXISTS canvas_revision INT NOT NULL DEFAULT 0 AFTER canvas_layout;
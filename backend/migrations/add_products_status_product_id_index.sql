@@ -0,0 +1,3 @@
+-- Covering index for keyset pagination of GET /products
+-- (WHERE status = 1 AND product_id < :cursor ORDER BY product_id DESC)
+CREATE INDEX idx_status_product_id ON products (status, product_id);
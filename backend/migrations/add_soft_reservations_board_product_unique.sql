@@ -0,0 +1,12 @@
+-- One soft reservation per board item, so it can be written with
+-- INSERT ... ON DUPLICATE KEY UPDATE (see _upsert_soft_reservation)
+
+-- Remove duplicates left by the old SELECT-then-INSERT code, keeping the newest row
+DELETE older FROM soft_reservations older
+JOIN soft_reservations newer
+  ON newer.board_id = older.board_id
+ AND newer.product_id = older.product_id
+ AND (newer.created_at > older.created_at
+      OR (newer.created_at = older.created_at AND newer.id > older.id));
+
+ALTER TABLE soft_reservations ADD UNIQUE KEY uq_soft_board_product (board_id, product_id);
@@ -0,0 +1,17 @@
+-- Counters for order_id and daily order numbers (OC-YYYYMMDD-XXXX), see order_numbers.py
+CREATE TABLE IF NOT EXISTS order_counters (
+    name VARCHAR(32) PRIMARY KEY,
+    value INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Continue from the orders that already exist
+INSERT INTO order_counters (name, value)
+SELECT 'order_id', COALESCE(MAX(order_id), 0) FROM orders
+ON DUPLICATE KEY UPDATE value = GREATEST(value, VALUES(value));
+
+INSERT INTO order_counters (name, value)
+SELECT CONCAT('OC-', DATE_FORMAT(CURDATE(), '%Y%m%d')),
+       COALESCE(MAX(CAST(SUBSTRING_INDEX(order_number, '-', -1) AS UNSIGNED)), 0)
+FROM orders
+WHERE order_number LIKE CONCAT('OC-', DATE_FORMAT(CURDATE(), '%Y%m%d'), '-%')
+ON DUPLICATE KEY UPDATE value = GREATEST(value, VALUES(value));
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Numeric, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Numeric, ForeignKey, Boolean, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -72,6 +72,11 @@ class Product(Base):
     category = relationship('Category', back_populates='products')
     tags = relationship('ProductTag', back_populates='product')
     event_board_items = relationship('EventBoardItem', back_populates='product')
+    
+    __table_args__ = (
+        # Keyset-пагінація каталогу: WHERE status = 1 AND product_id < ? ORDER BY product_id DESC
+        Index('idx_status_product_id', 'status', 'product_id'),
+    )
 
 class ProductTag(Base):
     __tablename__ = 'product_tags'
@@ -111,6 +116,7 @@ class EventBoard(Base):
     budget = Column(Numeric(10, 2))
     estimated_total = Column(Numeric(10, 2), default=0.00)
     canvas_layout = Column(JSON)
+    canvas_revision = Column(Integer, nullable=False, default=0)  # росте з кожною зміною canvas_layout
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     converted_to_order_id = Column(Integer)
@@ -152,6 +158,10 @@ class SoftReservation(Base):
     
     # Relationships
     board = relationship('EventBoard', back_populates='soft_reservations')
+    
+    __table_args__ = (
+        UniqueConstraint('board_id', 'product_id', name='uq_soft_board_product'),
+    )
 
 class ProductReservation(Base):
     __tablename__ = 'product_reservations'
@@ -202,6 +212,13 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class OrderCounter(Base):
+    """Named counters for order numbering (see order_numbers.py)"""
+    __tablename__ = 'order_counters'
+    
+    name = Column(String(32), primary_key=True)  # 'order_id' або 'OC-YYYYMMDD'
+    value = Column(Integer, nullable=False, default=0)
+
 class RefreshToken(Base):
     __tablename__ = 'refresh_tokens'
     
@@ -0,0 +1,100 @@
+"""
+Order number and order_id allocation.
+
+Both values come from rows of the order_counters table instead of scanning
+orders: the 'order_id' row holds the last issued order_id and one
+'OC-YYYYMMDD' row per day holds the last issued daily number. A counter is
+bumped with INSERT ... ON DUPLICATE KEY UPDATE value = LAST_INSERT_ID(value + 1),
+which is atomic in InnoDB, and the new value is read back with
+SELECT LAST_INSERT_ID() on the same connection.
+
+Allocation runs in its own short transaction so the counter row locks are
+released right away and concurrent checkouts do not wait for each other's
+order transaction. A rolled back checkout leaves a gap in the numbering.
+
+The counters are seeded from orders by the migration, but the orders table
+is shared with the warehouse system, which inserts orders without them.
+insert_order() therefore flushes the order in a savepoint. On a duplicate
+order_id / order_number key it moves the counters past the existing orders
+(GREATEST(value, MAX(...)), as the migration does) and allocates again.
+"""
+import logging
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Order, OrderCounter
+
+logger = logging.getLogger(__name__)
+
+ORDER_ID_COUNTER = 'order_id'
+ORDER_INSERT_ATTEMPTS = 3
+
+# MySQL ER_DUP_ENTRY
+DUPLICATE_ENTRY = 1062
+
+
+async def next_value(db: AsyncSession, name: str) -> int:
+    """Increment counter name (created at 1) and return its new value"""
+    stmt = insert(OrderCounter).values(name=name, value=func.last_insert_id(1))
+    stmt = stmt.on_duplicate_key_update(value=func.last_insert_id(OrderCounter.value + 1))
+    await db.execute(stmt)
+    result = await db.execute(select(func.last_insert_id()))
+    return int(result.scalar())
+
+
+async def allocate_order_number(session_factory=AsyncSessionLocal) -> Tuple[int, str]:
+    """Reserve (order_id, order_number) for a new order. Format: OC-YYYYMMDD-XXXX"""
+    day_counter = f"OC-{datetime.now().strftime('%Y%m%d')}"
+    async with session_factory() as db:
+        order_id = await next_value(db, ORDER_ID_COUNTER)
+        number = await next_value(db, day_counter)
+        await db.commit()
+    return order_id, f"{day_counter}-{number:04d}"
+
+
+async def resync_counters(day_counter: str, session_factory=AsyncSessionLocal):
+    """Move the order_id and day_counter counters past orders inserted without them"""
+    max_order_id = select(func.coalesce(func.max(Order.order_id), 0)).scalar_subquery()
+    max_number = select(
+        func.coalesce(func.max(cast(func.substring_index(Order.order_number, '-', -1), Integer)), 0)
+    ).where(Order.order_number.like(f"{day_counter}-%")).scalar_subquery()
+
+    async with session_factory() as db:
+        for name, value in ((ORDER_ID_COUNTER, max_order_id), (day_counter, max_number)):
+            stmt = insert(OrderCounter).values(name=name, value=value)
+            stmt = stmt.on_duplicate_key_update(value=func.greatest(OrderCounter.value, stmt.inserted.value))
+            await db.execute(stmt)
+        await db.commit()
+
+
+def _is_order_key_collision(error: IntegrityError) -> bool:
+    """Duplicate order_id (PRIMARY) or order_number - not a FK / NOT NULL failure"""
+    args = getattr(error.orig, 'args', ())
+    if len(args) < 2 or args[0] != DUPLICATE_ENTRY:
+        return False
+    return 'PRIMARY' in str(args[1]) or 'order_number' in str(args[1])
+
+
+async def insert_order(db: AsyncSession, order: Order, session_factory=AsyncSessionLocal) -> Order:
+    """
+    Assign order_id / order_number to a new order and flush it. A collision with
+    an order inserted by another writer resyncs the counters and retries.
+    """
+    for attempt in range(1, ORDER_INSERT_ATTEMPTS + 1):
+        order.order_id, order.order_number = await allocate_order_number(session_factory)
+        try:
+            async with db.begin_nested():
+                db.add(order)
+                await db.flush()
+            return order
+        except IntegrityError as e:
+            if attempt == ORDER_INSERT_ATTEMPTS or not _is_order_key_collision(e):
+                raise
+            logger.warning(f"Order {order.order_id} / {order.order_number} already exists, resyncing counters")
+            await resync_counters(order.order_number.rsplit('-', 1)[0], session_factory)
@@ -0,0 +1,146 @@
+"""
+Pre-render resized variants (image_variants.py) of every active product image,
+so the first catalog views after a warehouse sync do not wait for rendering.
+
+Run nightly after the sync:
+    python pregenerate_thumbnails.py [--workers N] [--concurrency N] [--limit N]
+
+An image whose variants are all newer than the source is skipped, so an
+interrupted run continues where it stopped when started again. Sources are
+read from the mounted uploads directory; without it they go through the disk
+cache of the image proxy (image_cache.py) exactly like /api/img does: a missing
+or stale original is downloaded (revalidated with its ETag / Last-Modified) and
+kept in the cache, so the server does not fetch it again on the first request.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import Product
+from image_cache import image_cache, IMAGE_CACHE_ENABLED
+from image_proxy import image_proxy, NOT_FOUND
+from image_variants import (
+    render_variants, variant_path, is_current, upload_source,
+    IMAGE_VARIANT_SIZES, IMAGE_VARIANT_AVIF, IMAGE_RESIZE_WORKERS, UPLOADS_PATH
+)
+
+FORMATS = ['webp'] + (['avif'] if IMAGE_VARIANT_AVIF else [])
+PROGRESS_EVERY = 200
+
+
+class Stats:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.rendered = 0
+        self.skipped = 0
+        self.missing = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.started = time.monotonic()
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        return (
+            f"{self.done}/{self.total} за {elapsed:.1f}s ({self.done / elapsed:.1f} img/s, "
+            f"рендер {self.rendered / elapsed:.1f} img/s): "
+            f"згенеровано {self.rendered}, актуальні {self.skipped}, не знайдено {self.missing}, "
+            f"помилки {self.failed}; "
+            f"{self.bytes_in / 1048576:.1f} MB -> {self.bytes_out / 1048576:.1f} MB"
+        )
+
+
+async def load_image_paths(limit: Optional[int] = None) -> List[str]:
+    async with AsyncSessionLocal() as db:
+        query = select(Product.image_url).where(
+            Product.status == 1,
+            Product.image_url.like('uploads/%')
+        ).distinct().order_by(Product.image_url)
+        if limit:
+            query = query.limit(limit)
+        result = await db.execute(query)
+        return [row[0] for row in result]
+
+
+def variant_targets(image_path: str) -> List[Tuple[str, int, int, str]]:
+    return [
+        (variant_path(image_path, width, height, fmt), width, height, fmt)
+        for width, height in sorted(IMAGE_VARIANT_SIZES)
+        for fmt in FORMATS
+    ]
+
+
+async def process(image_path: str, pool, semaphore: asyncio.Semaphore, stats: Stats):
+    targets = variant_targets(image_path)
+
+    async with semaphore:
+        try:
+            result, source_path = await upload_source(image_path[len('uploads/'):])
+            if result == NOT_FOUND:
+                stats.missing += 1
+                print(f"❌ {image_path}: не знайдено")
+                return
+            if source_path is None:
+                stats.failed += 1
+                print(f"❌ {image_path}: помилка завантаження з дзеркал")
+                return
+            if all(is_current(source_path, target[0]) for target in targets):
+                stats.skipped += 1
+                return
+
+            stats.bytes_in += os.path.getsize(source_path)
+            loop = asyncio.get_running_loop()
+            stats.bytes_out += await loop.run_in_executor(pool, render_variants, source_path, targets)
+            stats.rendered += 1
+        except Exception as e:
+            stats.failed += 1
+            print(f"❌ {image_path}: {e}")
+        finally:
+            stats.done += 1
+            if stats.done % PROGRESS_EVERY == 0:
+                print(f"… {stats.line()}")
+
+
+async def pregenerate(workers: int, concurrency: int, limit: Optional[int] = None):
+    image_paths = await load_image_paths(limit)
+    print(f"📷 Зображень товарів: {len(image_paths)}, розміри: "
+          f"{', '.join(f'{w}x{h}' for w, h in sorted(IMAGE_VARIANT_SIZES))}, формати: {', '.join(FORMATS)}")
+    if not os.path.exists(UPLOADS_PATH):
+        if not IMAGE_CACHE_ENABLED:
+            print("⚠️ Uploads не змонтовано, а IMAGE_CACHE_ENABLED=0 - нікуди завантажувати оригінали")
+            return None
+        print("⚠️ Uploads не змонтовано - оригінали завантажуються з дзеркал складу в кеш зображень")
+        # Повний індекс кешу: ліміт IMAGE_CACHE_MAX_BYTES рахується від усього, що лежить на диску
+        await image_cache.load()
+        await image_proxy.start()
+
+    stats = Stats(len(image_paths))
+    semaphore = asyncio.Semaphore(concurrency)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            await asyncio.gather(*(process(path, pool, semaphore, stats) for path in image_paths))
+        finally:
+            await image_proxy.close()
+
+    print(f"✓ {stats.line()}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render product image variants")
+    parser.add_argument('--workers', type=int, default=max(IMAGE_RESIZE_WORKERS, os.cpu_count() or 1),
+                        help="processes that render images")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="images downloaded / rendered at once (default: 2 x workers)")
+    parser.add_argument('--limit', type=int, default=None, help="only the first N images")
+    args = parser.parse_args()
+
+    asyncio.run(pregenerate(args.workers, args.concurrency or 2 * args.workers, args.limit))
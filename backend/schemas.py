@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Literal
 from datetime import date, datetime
 from decimal import Decimal
 
@@ -53,6 +53,25 @@ class ProductListItem(BaseModel):
     reserved: Optional[int] = 0  # Зарезервовано в мудбордах
     available: Optional[int] = 0  # Реально доступно = quantity - frozen - reserved
 
+class ProductPage(BaseModel):
+    """Сторінка товарів для keyset-пагінації"""
+    items: List[ProductListItem]
+    next_cursor: Optional[str] = None  # None - це остання сторінка
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class ProductFacets(BaseModel):
+    """Кількість товарів по фасетах для поточних фільтрів"""
+    total: int
+    categories: List[FacetCount]
+    subcategories: List[FacetCount]
+    colors: List[FacetCount]
+    materials: List[FacetCount]
+    price_min: Optional[Decimal] = None
+    price_max: Optional[Decimal] = None
+
 class ProductDetail(ProductListItem):
     description: Optional[str]
     care_instructions: Optional[str]
@@ -80,6 +99,17 @@ class CategoryResponse(BaseModel):
     sort_order: Optional[int]
     is_active: bool
 
+class CatalogTreeSubcategory(BaseModel):
+    name: str
+    subcategory_id: Optional[int]
+    count: int
+
+class CatalogTreeCategory(BaseModel):
+    category: str
+    category_id: Optional[int]
+    count: int
+    subcategories: List[CatalogTreeSubcategory]
+
 # Event Board Schemas
 class EventBoardCreate(BaseModel):
     board_name: str = Field(..., min_length=1, max_length=255)
@@ -112,6 +142,16 @@ class EventBoardItemUpdate(BaseModel):
     notes: Optional[str] = None
     section: Optional[str] = None
 
+class EventBoardItemOperation(BaseModel):
+    """Одна операція в POST /boards/{id}/items:batch"""
+    op: Literal['add', 'update', 'delete', 'reorder']
+    item_id: Optional[str] = None  # update, delete
+    product_id: Optional[int] = None  # add
+    quantity: Optional[int] = Field(default=None, ge=1)
+    notes: Optional[str] = None
+    section: Optional[str] = None
+    item_ids: Optional[List[str]] = None  # reorder: items in their new order
+
 class EventBoardItemResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     
@@ -139,14 +179,53 @@ class EventBoardResponse(BaseModel):
     status: str
     notes: Optional[str]
     cover_image: Optional[str]
+    cover_variants: Optional[Dict[str, str]] = None  # thumb/card/full URLs for uploaded covers
     budget: Optional[Decimal]
     estimated_total: Decimal
     canvas_layout: Optional[dict]
+    canvas_revision: int = 0
     created_at: datetime
     updated_at: datetime
     converted_to_order_id: Optional[int]
     items: List[EventBoardItemResponse] = []
 
+class EventBoardSummary(BaseModel):
+    """Мудборд для списку (без товарів)"""
+    id: str
+    board_name: str
+    event_date: Optional[date]
+    event_type: Optional[str]
+    rental_start_date: Optional[date]
+    rental_end_date: Optional[date]
+    rental_days: Optional[int]
+    status: str
+    cover_image: Optional[str]
+    cover_variants: Optional[Dict[str, str]] = None
+    estimated_total: Decimal
+    updated_at: datetime
+    items_count: int
+    total_quantity: int
+
+class BoardCoverResponse(BaseModel):
+    cover_image: str
+    cover_variants: Dict[str, str]
+
+class CanvasLayoutOperation(BaseModel):
+    """JSON Patch (RFC 6902) операція над canvas_layout"""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    op: Literal['add', 'remove', 'replace', 'move', 'copy', 'test']
+    path: str
+    value: Optional[Any] = None
+    from_: Optional[str] = Field(default=None, alias='from')
+
+class CanvasLayoutPatch(BaseModel):
+    revision: int  # ревізія, від якої клієнт рахував зміни
+    operations: List[CanvasLayoutOperation] = Field(..., max_length=500)
+
+class CanvasLayoutRevision(BaseModel):
+    revision: int
+
 # Availability Check Schema
 class AvailabilityCheckRequest(BaseModel):
     product_id: int
@@ -159,6 +238,18 @@ class AvailabilityCheckResponse(BaseModel):
     requested_quantity: int
     available_quantity: int
     is_available: bool
+    message: Optional[str] = None
+
+class AvailabilityDay(BaseModel):
+    date: date
+    available: int
+
+class AvailabilityCalendar(BaseModel):
+    product_id: int
+    total_quantity: int
+    date_from: date
+    date_to: date
+    days: List[AvailabilityDay]
 
 
 # Order Schemas
@@ -221,5 +312,3 @@ class OrderResponse(BaseModel):
     damage_fee: Optional[Decimal] = None
     issue_time: Optional[str] = None
     return_time: Optional[str] = None
-
-    message: Optional[str]
\ No newline at end of file
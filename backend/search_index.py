@@ -0,0 +1,139 @@
+"""
+Inverted index for catalog search.
+
+Products are tokenized over name, SKU, category, subcategory, color, material
+and tags. Tokens are case-folded with Ukrainian/Russian normalization, and
+query tokens match index terms by prefix. Every query token has to match
+(AND), and results are ranked by the weight of the fields that matched.
+"""
+import bisect
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+# Чим важливіше поле, тим вище товар у видачі
+FIELD_WEIGHTS = {
+    'sku': 8,
+    'name': 4,
+    'tags': 3,
+    'subcategory_name': 2,
+    'category_name': 2,
+    'color': 1,
+    'material': 1,
+}
+
+# Повний збіг терміну важить більше, ніж збіг за префіксом
+EXACT_MATCH_BONUS = 2
+
+_APOSTROPHES = re.compile(r"['`ʼ’‘]")
+_WORD = re.compile(r"[^\W_]+")
+_ALNUM_PARTS = re.compile(r"\d+|[^\W\d_]+")
+# ё/ґ часто набирають як е/г - зводимо до однієї форми
+_LETTER_MAP = str.maketrans({'ё': 'е', 'ґ': 'г'})
+
+
+def normalize(text: Optional[str]) -> str:
+    """Case-fold text the same way for documents and queries"""
+    if not text:
+        return ''
+    return _APOSTROPHES.sub('', text.casefold()).translate(_LETTER_MAP)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split text into search terms.
+    Mixed letter/digit words (SKU like FI8685) also yield their parts,
+    so both 'fi8685' and '8685' find the product.
+    """
+    tokens = []
+    for word in _WORD.findall(normalize(text)):
+        tokens.append(word)
+        parts = _ALNUM_PARTS.findall(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class SearchIndex:
+    """Term -> {product_id: weight} postings with prefix lookup over sorted terms"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._terms: List[str] = []
+        self._terms_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, product_id: int, fields: Dict[str, Iterable[str]]):
+        """Index a product. fields maps FIELD_WEIGHTS keys to text or list of texts."""
+        self.remove(product_id)
+
+        weights: Dict[str, int] = {}
+        for field, values in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = (values,)
+            for value in values:
+                for term in tokenize(value):
+                    if weights.get(term, 0) < weight:
+                        weights[term] = weight
+
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._terms_dirty = True
+            postings[product_id] = weight
+        self._doc_terms[product_id] = set(weights)
+
+    def remove(self, product_id: int):
+        terms = self._doc_terms.pop(product_id, None)
+        if not terms:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._postings[term]
+                self._terms_dirty = True
+
+    def _expand(self, prefix: str) -> List[str]:
+        """All index terms starting with prefix"""
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        start = bisect.bisect_left(self._terms, prefix)
+        end = bisect.bisect_left(self._terms, prefix + '\U0010ffff')
+        return self._terms[start:end]
+
+    def search(self, query: str) -> List[int]:
+        """Ranked product IDs matching every query token (best first, newest first on ties)"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        scores: Optional[Dict[int, int]] = None
+        for token in tokens:
+            token_scores: Dict[int, int] = {}
+            for term in self._expand(token):
+                bonus = EXACT_MATCH_BONUS if term == token else 1
+                for product_id, weight in self._postings[term].items():
+                    score = weight * bonus
+                    if token_scores.get(product_id, 0) < score:
+                        token_scores[product_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    product_id: score + token_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in token_scores
+                }
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda product_id: (-scores[product_id], -product_id))
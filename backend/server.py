@@ -1,28 +1,48 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Query, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse, Response
+from fastapi.responses import StreamingResponse, Response, FileResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc, delete
-from typing import List, Optional
-from datetime import datetime, timedelta
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy import select, func, and_, or_, delete, insert, update, union_all, case, literal
+from typing import Dict, List, Optional, Union
+from datetime import date, datetime, timedelta
 import os
 import uuid
+import base64
+import binascii
+import mimetypes
 import logging
-import httpx
+import asyncio
+from contextlib import asynccontextmanager
 
-from database import get_db
+from database import get_db, AsyncSessionLocal
 from models import Customer, Product, Category, EventBoard, EventBoardItem, SoftReservation, ProductReservation, Order
 from schemas import (
     CustomerRegister, CustomerLogin, Token, CustomerResponse,
-    ProductListItem, ProductDetail,
-    CategoryResponse, EventBoardCreate, EventBoardUpdate,
-    EventBoardResponse, EventBoardItemCreate, EventBoardItemUpdate,
-    EventBoardItemResponse, AvailabilityCheckRequest, AvailabilityCheckResponse,
+    ProductListItem, ProductDetail, ProductPage, ProductFacets,
+    CategoryResponse, CatalogTreeCategory, EventBoardCreate, EventBoardUpdate,
+    EventBoardResponse, EventBoardSummary, CanvasLayoutPatch, CanvasLayoutRevision, BoardCoverResponse, EventBoardItemCreate, EventBoardItemUpdate, EventBoardItemOperation,
+    EventBoardItemResponse, AvailabilityCheckRequest, AvailabilityCheckResponse, AvailabilityCalendar,
     OrderCreate, OrderResponse
 )
+from catalog import catalog, build_category_tree, run_catalog_refresh, CATALOG_SNAPSHOT_ENABLED
+from facets import FacetIndex, FACET_FIELDS
+from availability import availability, run_availability_sync, sweep_occupancy, AVAILABILITY_ENGINE_ENABLED
+from order_numbers import insert_order
+from board_totals import apply_item_delta, rescale_for_dates, run_board_totals_verifier, BOARD_TOTALS_VERIFY_SECONDS
+from json_patch import apply_patch, JsonPatchError
+from cover_store import save_cover, cover_urls, cover_image_url, variant_path, is_valid_key, CoverImageError, COVER_VARIANTS
+from image_proxy import image_proxy, FOUND, NOT_MODIFIED, ERROR
+from image_variants import (
+    variant_renderer, variant_format, variant_response, upload_source, ImageVariantError,
+    IMAGE_VARIANT_SIZES, UPLOADS_PATH
+)
+from image_cache import image_cache, IMAGE_CACHE_ENABLED, BROWSER_CACHE_CONTROL
+from board_loader import board_to_dict, item_to_dict, load_board, load_board_items, load_boards
 from auth import (
-    get_password_hash, authenticate_customer, create_access_token,
+    hash_password, password_queue, authenticate_customer, create_access_token,
     create_refresh_token, get_current_user
 )
 
@@ -30,15 +50,47 @@ from auth import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown фонових задач"""
+    
+    # In-memory snapshot каталогу: перше завантаження і інкрементальний refresh по synced_at.
+    # Поки snapshot не готовий, ендпоінти товарів читають з MySQL.
+    background_tasks = []
+    
+    # Спільний HTTP-клієнт проксі зображень (keep-alive, HTTP/2) і дисковий кеш зображень
+    await image_proxy.start()
+    if IMAGE_CACHE_ENABLED:
+        await image_cache.load()
+    
+    if CATALOG_SNAPSHOT_ENABLED:
+        background_tasks.append(asyncio.create_task(run_catalog_refresh(AsyncSessionLocal)))
+    
+    # Таймлайни зайнятості товарів по днях (ProductReservation + SoftReservation)
+    if AVAILABILITY_ENGINE_ENABLED:
+        background_tasks.append(asyncio.create_task(run_availability_sync(AsyncSessionLocal)))
+    
+    # Звірка estimated_total мудбордів (ціни товарів змінюються синхронізацією)
+    if BOARD_TOTALS_VERIFY_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_board_totals_verifier(AsyncSessionLocal)))
+    
+    yield
+    
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    
+    await image_proxy.close()
+    variant_renderer.close()
+
 # Create FastAPI app
-app = FastAPI(title="FarforDecor Event Planning API")
+app = FastAPI(title="FarforDecor Event Planning API", lifespan=lifespan)
 
 # Mount uploads from production warehouse server
 # Single source of truth for all product images
 # Database stores paths like: uploads/products/FI8685_1764271319.png
 
-# Шлях на production сервері
-UPLOADS_PATH = "/home/farforre/farforrent.com.ua/rentalhub/backend/uploads"
+# Шлях на production сервері - UPLOADS_PATH (image_variants.py)
 
 if os.path.exists(UPLOADS_PATH):
     app.mount(
@@ -55,39 +107,82 @@ else:
 api_router = APIRouter(prefix="/api")
 
 # Proxy endpoint для зображень (якщо production uploads не знайдено)
-if not os.path.exists("/home/farforre/farforrent.com.ua/rentalhub/backend/uploads"):
-    # Production warehouse backend URL
-    PRODUCTION_BACKEND_URL = os.getenv('PRODUCTION_BACKEND_URL', 'https://backrentalhub.farforrent.com.ua')
+if not os.path.exists(UPLOADS_PATH):
     
     @api_router.get("/uploads/{full_path:path}")
     async def proxy_uploads(full_path: str):
-        """Проксує запити до production warehouse backend"""
-        # Спробувати різні можливі шляхи
-        possible_urls = [
-            f"{PRODUCTION_BACKEND_URL}/uploads/{full_path}",
-            f"https://backrentalhub.farforrent.com.ua/uploads/{full_path}",
-            f"https://www.farforrent.com.ua/uploads/{full_path}",
-        ]
+        """Проксує запити до production warehouse backend (дисковий кеш, див. image_cache.py)"""
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            for target_url in possible_urls:
-                try:
-                    response = await client.get(target_url, follow_redirects=True)
-                    
-                    if response.status_code == 200:
-                        return Response(
-                            content=response.content,
-                            media_type=response.headers.get('content-type', 'application/octet-stream'),
-                            headers={
-                                'Cache-Control': 'public, max-age=86400',
-                            }
-                        )
-                except Exception:
-                    continue
-            
-            # Якщо жодне зображення не знайдено, повернути placeholder
+        entry = await image_cache.lookup(full_path) if IMAGE_CACHE_ENABLED else None
+        if entry is not None and entry.is_fresh:
+            return image_cache.response(entry)
+        
+        if image_proxy.is_missing(full_path):
+            return Response(status_code=404, content=b'Image not found')
+        
+        headers = {'Cache-Control': BROWSER_CACHE_CONTROL}
+        
+        if not IMAGE_CACHE_ENABLED:
+            # Без кешу - тіло потоком від дзеркала до клієнта
+            result, response = await image_proxy.open(full_path)
+            if result == FOUND:
+                return StreamingResponse(
+                    response.aiter_bytes(),
+                    media_type=response.headers.get('content-type', 'application/octet-stream'),
+                    headers=headers,
+                    background=BackgroundTask(response.aclose)
+                )
             logger.warning(f"Image not found: {full_path}")
             return Response(status_code=404, content=b'Image not found')
+        
+        # Одне завантаження на шлях; застарілий запис - умовний запит (ETag / Last-Modified)
+        download = image_proxy.download(full_path, entry)
+        result = await download.wait()
+        
+        if result == FOUND and not download.failed:
+            if download.etag:
+                headers['ETag'] = download.etag
+            try:
+                body = download.body()
+            except FileNotFoundError:
+                body = None
+            if body is not None:
+                return StreamingResponse(body, media_type=download.content_type, headers=headers)
+        
+        # 304, або upstream недоступний - краще застаріле зображення, ніж жодного
+        if entry is not None and result in (NOT_MODIFIED, ERROR):
+            return image_cache.response(entry)
+        
+        # Якщо жодне зображення не знайдено, повернути placeholder
+        logger.warning(f"Image not found: {full_path}")
+        return Response(status_code=404, content=b'Image not found')
+
+
+@api_router.get("/img/{width:int}x{height:int}/{image_path:path}")
+async def resized_image(width: int, height: int, image_path: str, request: Request):
+    """Зменшене зображення товару (WebP), напр. /api/img/480x360/uploads/products/X.png"""
+    
+    if (width, height) not in IMAGE_VARIANT_SIZES or not image_path.startswith('uploads/'):
+        raise HTTPException(status_code=404, detail="Image size not available")
+    
+    _, source_path = await upload_source(image_path[len('uploads/'):])
+    if source_path is None:
+        return Response(status_code=404, content=b'Image not found')
+    
+    fmt = variant_format(request.headers.get('accept'))
+    try:
+        target_path = await variant_renderer.variant(image_path, source_path, width, height, fmt)
+    except ImageVariantError as e:
+        # Не вдалося декодувати - віддати оригінал як є
+        logger.warning(str(e))
+        if not os.path.exists(source_path):
+            return Response(status_code=404, content=b'Image not found')
+        return FileResponse(
+            source_path,
+            media_type=mimetypes.guess_type(image_path)[0] or 'application/octet-stream',
+            headers={'Cache-Control': BROWSER_CACHE_CONTROL}
+        )
+    return variant_response(target_path, fmt)
 
 # CORS
 app.add_middleware(
@@ -119,7 +214,7 @@ async def register(customer_data: CustomerRegister, db: AsyncSession = Depends(g
     # Create new customer
     new_customer = Customer(
         email=customer_data.email,
-        password_hash=get_password_hash(customer_data.password),
+        password_hash=await hash_password(customer_data.password),
         firstname=customer_data.firstname,
         lastname=customer_data.lastname,
         telephone=customer_data.telephone,
@@ -180,6 +275,9 @@ async def get_categories(
 ):
     """Отримати список категорій"""
     
+    if catalog.is_ready:
+        return catalog.categories(parent_id)
+    
     query = select(Category).where(Category.is_active == True)
     
     if parent_id is not None:
@@ -194,6 +292,34 @@ async def get_categories(
     
     return categories
 
+@api_router.get("/catalog/tree", response_model=List[CatalogTreeCategory])
+async def get_catalog_tree(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Дерево категорія → підкатегорії з кількістю товарів.
+    Рахується один раз і тримається в пам'яті до зміни категорій при синхронізації
+    (з CATALOG_SNAPSHOT_ENABLED=0 - на кожен запит з MySQL);
+    ETag дозволяє браузеру не завантажувати дерево повторно (304).
+    """
+    
+    if CATALOG_SNAPSHOT_ENABLED:
+        await catalog.ensure_loaded(db)
+        body, etag = catalog.category_tree()
+    else:
+        # Snapshot ніхто не оновлює - ETag рахується з актуальних даних
+        products = await db.execute(
+            select(Product.category_id, Product.category_name, Product.subcategory_id, Product.subcategory_name)
+            .where(Product.status == 1)
+            .order_by(Product.product_id.desc())
+        )
+        categories = await db.execute(select(Category.category_id, Category.sort_order))
+        body, etag = build_category_tree(products.all(), [dict(row) for row in categories.mappings()])
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type='application/json', headers=headers)
+
 @api_router.get("/subcategories")
 async def get_subcategories(
     category_name: Optional[str] = None,
@@ -201,37 +327,40 @@ async def get_subcategories(
 ):
     """Отримати список підкатегорій з продуктів"""
     
-    # Build query
-    query = select(Product.category_name, Product.subcategory_name).where(
-        and_(
-            Product.status == 1,
-            Product.category_name.isnot(None),
-            Product.subcategory_name.isnot(None),
-            Product.subcategory_name != ''
-        )
-    ).distinct()
-    
-    # Filter by category if provided
-    if category_name:
-        query = query.where(Product.category_name == category_name)
-    
-    result = await db.execute(query)
-    rows = result.all()
+    if catalog.is_ready:
+        pairs = catalog.subcategory_pairs(category_name)
+    else:
+        # Build query
+        query = select(Product.category_name, Product.subcategory_name).where(
+            and_(
+                Product.status == 1,
+                Product.category_name.isnot(None),
+                Product.subcategory_name.isnot(None),
+                Product.subcategory_name != ''
+            )
+        ).distinct()
+        
+        # Filter by category if provided
+        if category_name:
+            query = query.where(Product.category_name == category_name)
+        
+        result = await db.execute(query)
+        pairs = [(row.category_name, row.subcategory_name) for row in result.all()]
     
     # Build response
     if category_name:
         # Return just subcategory names for a specific category
-        subcategories = sorted(set(row.subcategory_name for row in rows if row.subcategory_name))
+        subcategories = sorted(set(sub_name for _, sub_name in pairs if sub_name))
         return {"category": category_name, "subcategories": subcategories}
     else:
         # Return all category-subcategory pairs
         category_subcategories = {}
-        for row in rows:
+        for cat_name, sub_name in pairs:
             # Skip if category_name is None
-            if row.category_name and row.subcategory_name:
-                if row.category_name not in category_subcategories:
-                    category_subcategories[row.category_name] = set()
-                category_subcategories[row.category_name].add(row.subcategory_name)
+            if cat_name and sub_name:
+                if cat_name not in category_subcategories:
+                    category_subcategories[cat_name] = set()
+                category_subcategories[cat_name].add(sub_name)
         
         # Convert to list format
         result_list = []
@@ -247,8 +376,199 @@ async def get_subcategories(
 # PRODUCTS ENDPOINTS
 # ============================================================================
 
-@api_router.get("/products", response_model=List[ProductListItem])
-async def get_products(
+def encode_product_cursor(value: int, kind: str = 'p') -> str:
+    """
+    Opaque cursor for /products pagination.
+    kind 'p' - keyset by product_id, kind 'o' - position in relevance-ranked search results.
+    """
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip('=')
+
+def decode_product_cursor(cursor: str) -> tuple:
+    """Decode cursor produced by encode_product_cursor into (kind, value)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        kind, value = base64.urlsafe_b64decode(padded.encode()).decode().split(':', 1)
+        if kind not in ('p', 'o'):
+            raise ValueError(kind)
+        return kind, int(value)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _period_reservations_query(
+    date_from: date,
+    date_to: date,
+    product_ids: Optional[List[int]] = None,
+    exclude_board_id: Optional[str] = None
+):
+    """
+    Hard + активні soft резерви на період по product_id - максимум зайнятості по днях
+    (як у таймлайнах), а не сума всіх резервів, що перетинаються з періодом.
+    Кожен резерв - подія +quantity у день початку (не раніше date_from) і -quantity
+    після дня завершення; максимум накопичувальної суми подій = пік зайнятості.
+    """
+    
+    hard_conditions = [
+        ProductReservation.status == 'active',
+        ProductReservation.reserved_from <= date_to,
+        ProductReservation.reserved_until >= date_from,
+        ProductReservation.reserved_until >= ProductReservation.reserved_from
+    ]
+    soft_conditions = [
+        SoftReservation.status == 'active',
+        SoftReservation.expires_at > datetime.utcnow(),
+        SoftReservation.reserved_from <= date_to,
+        SoftReservation.reserved_until >= date_from,
+        SoftReservation.reserved_until >= SoftReservation.reserved_from
+    ]
+    if product_ids is not None:
+        hard_conditions.append(ProductReservation.product_id.in_(product_ids))
+        soft_conditions.append(SoftReservation.product_id.in_(product_ids))
+    if exclude_board_id:
+        soft_conditions.append(SoftReservation.board_id != exclude_board_id)
+    
+    # kind 0 - початок, 1 - кінець: у день завершення резерв ще займає товар,
+    # тому в межах дня спершу додаються початки, потім віднімаються завершення
+    event_selects = []
+    for model, conditions in ((ProductReservation, hard_conditions), (SoftReservation, soft_conditions)):
+        quantity = func.coalesce(model.quantity, 0)
+        event_selects.append(
+            select(
+                model.product_id.label('product_id'),
+                case((model.reserved_from < date_from, date_from), else_=model.reserved_from).label('day'),
+                literal(0).label('kind'),
+                quantity.label('delta')
+            ).where(and_(*conditions))
+        )
+        event_selects.append(
+            select(
+                model.product_id.label('product_id'),
+                model.reserved_until.label('day'),
+                literal(1).label('kind'),
+                (-quantity).label('delta')
+            ).where(and_(*conditions))
+        )
+    events = union_all(*event_selects).subquery()
+    
+    daily = select(
+        events.c.product_id,
+        events.c.day,
+        events.c.kind,
+        func.sum(events.c.delta).label('delta')
+    ).group_by(events.c.product_id, events.c.day, events.c.kind).subquery()
+    
+    running = select(
+        daily.c.product_id,
+        func.sum(daily.c.delta).over(
+            partition_by=daily.c.product_id,
+            order_by=(daily.c.day, daily.c.kind)
+        ).label('occupied')
+    ).subquery()
+    
+    return select(
+        running.c.product_id,
+        func.max(running.c.occupied).label('reserved')
+    ).group_by(running.c.product_id)
+
+async def _reserved_for_period(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    product_ids: Optional[List[int]] = None,
+    exclude_board_id: Optional[str] = None
+) -> dict:
+    """
+    Зарезервовано на період по товарах: з таймлайнів, якщо період у вікні
+    і відомий список товарів, інакше одним згрупованим запитом.
+    exclude_board_id - не рахувати soft резерви цього мудборду.
+    """
+    
+    if product_ids is not None and availability.covers(date_from, date_to):
+        return {
+            pid: availability.reserved(pid, date_from, date_to, exclude_board_id)
+            for pid in product_ids
+        }
+    
+    result = await db.execute(_period_reservations_query(date_from, date_to, product_ids, exclude_board_id))
+    return {row.product_id: int(row.reserved or 0) for row in result.all()}
+
+async def _products_with_availability(db: AsyncSession, products, period: Optional[tuple] = None) -> List[ProductListItem]:
+    """
+    Додати статистику доступності до списку товарів (batch).
+    period=(from, until) - рахувати hard + soft резерви на ці дати.
+    """
+    
+    # Batch запит: підрахунок SoftReservation для всіх товарів одразу
+    product_ids = [p.product_id for p in products]
+    
+    if period:
+        soft_reserved_dict = await _reserved_for_period(db, period[0], period[1], product_ids)
+    else:
+        # Активні м'які резервації (в мудбордах з датами оренди)
+        soft_reservations_query = select(
+            SoftReservation.product_id,
+            func.sum(SoftReservation.quantity).label('reserved')
+        ).where(
+            and_(
+                SoftReservation.product_id.in_(product_ids),
+                SoftReservation.status == 'active',
+                SoftReservation.expires_at >= datetime.utcnow()
+            )
+        ).group_by(SoftReservation.product_id)
+        
+        soft_result = await db.execute(soft_reservations_query)
+        soft_reserved_dict = {row.product_id: int(row.reserved) for row in soft_result}
+    
+    # TODO: Додати підрахунок товарів на мийці/хімчистці/реставрації
+    # Якщо буде таблиця product_cleaning_status:
+    # cleaning_query = select(product_id, 1).where(status IN ('washing', 'repair', 'dry_cleaning'))
+    # cleaning_dict = {row[0]: 1 for row in cleaning_result}
+    
+    # Додати доступність до кожного продукту
+    products_with_availability = []
+    for product in products:
+        product_dict = {
+            "product_id": product.product_id,
+            "sku": product.sku,
+            "name": product.name,
+            "category_id": product.category_id,
+            "category_name": product.category_name,
+            "subcategory_id": product.subcategory_id,
+            "subcategory_name": product.subcategory_name,
+            "rental_price": float(product.rental_price) if product.rental_price else 0.0,
+            "image_url": product.image_url,
+            "color": product.color,
+            "material": product.material,
+            "size": product.size,
+            "status": product.status,
+            
+            # Статистика доступності
+            "quantity": product.quantity or 0,
+            "frozen_quantity": product.frozen_quantity or 0,
+            "reserved": soft_reserved_dict.get(product.product_id, 0),
+            "available": max(0, 
+                (product.quantity or 0) - 
+                (product.frozen_quantity or 0) - 
+                soft_reserved_dict.get(product.product_id, 0)
+            ),
+            # TODO: додати in_cleaning, in_repair коли буде таблиця
+        }
+        products_with_availability.append(ProductListItem(**product_dict))
+    
+    return products_with_availability
+
+def _product_search_condition(search: str):
+    search_pattern = f"%{search}%"
+    return or_(
+        Product.name.like(search_pattern),
+        Product.sku.like(search_pattern),
+        Product.category_name.like(search_pattern)
+    )
+
+async def _query_products(
+    db: AsyncSession,
+    skip: int,
+    limit: int,
+    after_id: Optional[int] = None,
     search: Optional[str] = None,
     category_id: Optional[int] = None,
     category_name: Optional[str] = None,
@@ -257,30 +577,16 @@ async def get_products(
     material: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    skip: int = 0,
-    limit: int = 50,  # Зменшено для lazy loading
-    include_availability: bool = True,  # Додано опція для розрахунку доступності
-    db: AsyncSession = Depends(get_db)
+    period: Optional[tuple] = None,
+    min_available: int = 1,
 ):
-    """
-    Отримати список товарів з фільтрами
-    ✅ Розраховує available з врахуванням:
-       - SoftReservation (резерви в мудбордах)
-       - Статус чистки (мийка, хімчистка, реставрація)
-    """
+    """SQL-варіант вибірки товарів (коли snapshot каталогу ще не завантажено)"""
     
     query = select(Product).where(Product.status == 1)
     
     # Search
     if search:
-        search_pattern = f"%{search}%"
-        query = query.where(
-            or_(
-                Product.name.like(search_pattern),
-                Product.sku.like(search_pattern),
-                Product.category_name.like(search_pattern)
-            )
-        )
+        query = query.where(_product_search_condition(search))
     
     # Filters
     if category_id:
@@ -304,155 +610,481 @@ async def get_products(
     if max_price:
         query = query.where(Product.rental_price <= max_price)
     
+    # Доступні на дати: згрупований підзапит резервів, до пагінації
+    if period:
+        reserved = _period_reservations_query(period[0], period[1]).subquery()
+        query = query.outerjoin(reserved, reserved.c.product_id == Product.product_id).where(
+            func.coalesce(Product.quantity, 0)
+            - func.coalesce(Product.frozen_quantity, 0)
+            - func.coalesce(reserved.c.reserved, 0) >= min_available
+        )
+    
     # Sort by product_id DESC to show latest added products first
     query = query.order_by(Product.product_id.desc())
     
     # Pagination
+    if after_id is not None:
+        # Seek замість OFFSET: сторінка коштує однаково на будь-якій глибині
+        query = query.where(Product.product_id < after_id)
     query = query.offset(skip).limit(limit)
     
     result = await db.execute(query)
-    products = result.scalars().all()
+    return result.scalars().all()
+
+@api_router.get("/products", response_model=Union[ProductPage, List[ProductListItem]])
+async def get_products(
+    search: Optional[str] = None,
+    category_id: Optional[int] = None,
+    category_name: Optional[str] = None,
+    subcategory_name: Optional[str] = None,
+    color: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    skip: int = 0,
+    limit: int = 50,  # Зменшено для lazy loading
+    include_availability: bool = True,  # Додано опція для розрахунку доступності
+    cursor: bool = False,  # Keyset-пагінація: повертає {items, next_cursor}
+    after: Optional[str] = None,  # next_cursor з попередньої сторінки
+    available_from: Optional[date] = None,  # Тільки товари, доступні на ці дати
+    available_until: Optional[date] = None,
+    min_available: Optional[int] = Query(None, ge=1),  # Мінімум вільних одиниць на дати (за замовчуванням 1)
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Отримати список товарів з фільтрами
+    ✅ Розраховує available з врахуванням:
+       - SoftReservation (резерви в мудбордах)
+       - Статус чистки (мийка, хімчистка, реставрація)
+    ✅ Keyset-пагінація (cursor=true або after=<next_cursor>):
+       product_id < cursor по індексу (status, product_id) замість OFFSET
+    ✅ search - повнотекстовий індекс каталогу (префікси, ранжування за релевантністю)
+    ✅ available_from/available_until/min_available - фільтр доступності на дати
+       застосовується до пагінації, тож сторінка містить лише товари, які можна орендувати
+    """
+    
+    period = None
+    if min_available is not None and not (available_from and available_until):
+        raise HTTPException(status_code=400, detail="min_available requires available_from and available_until")
+    if available_from or available_until:
+        if not (available_from and available_until):
+            raise HTTPException(status_code=400, detail="Both available_from and available_until are required")
+        if available_until < available_from:
+            raise HTTPException(status_code=400, detail="available_until must not be earlier than available_from")
+        period = (available_from, available_until)
+        min_available = 1 if min_available is None else min_available
+    
+    cursor_mode = cursor or after is not None
+    
+    # Пошук через індекс каталогу сортує за релевантністю, а не за product_id,
+    # тому cursor для нього - позиція у видачі
+    ranked = bool(search) and catalog.is_ready
+    
+    # Один зайвий рядок у cursor-режимі показує, чи є наступна сторінка
+    page_skip = 0 if cursor_mode else skip
+    page_limit = limit + 1 if cursor_mode else limit
+    
+    after_id = None
+    if after:
+        kind, value = decode_product_cursor(after)
+        if kind == 'o':
+            page_skip = value
+        else:
+            after_id = value
+    
+    filters = dict(
+        search=search,
+        category_id=category_id,
+        category_name=category_name,
+        subcategory_name=subcategory_name,
+        color=color,
+        material=material,
+        min_price=min_price,
+        max_price=max_price,
+    )
+    
+    if catalog.is_ready:
+        if period:
+            if availability.covers(*period):
+                # Таймлайни зайнятості в пам'яті
+                period_reserved = None
+            else:
+                period_reserved = await _reserved_for_period(db, *period)
+            
+            def is_rentable(p):
+                if period_reserved is None:
+                    reserved = availability.reserved(p.product_id, *period)
+                else:
+                    reserved = period_reserved.get(p.product_id, 0)
+                return (p.quantity or 0) - (p.frozen_quantity or 0) - reserved >= min_available
+            
+            filters['predicate'] = is_rentable
+        # Читання з in-memory snapshot каталогу, без запиту до MySQL
+        products = catalog.query(skip=page_skip, limit=page_limit, after_id=after_id, **filters)
+    else:
+        products = await _query_products(
+            db, skip=page_skip, limit=page_limit, after_id=after_id,
+            period=period, min_available=min_available, **filters
+        )
+    
+    next_cursor = None
+    if cursor_mode and len(products) > limit:
+        products = products[:limit]
+        if ranked:
+            next_cursor = encode_product_cursor(page_skip + limit, kind='o')
+        else:
+            next_cursor = encode_product_cursor(products[-1].product_id)
     
     # Якщо потрібна статистика доступності - рахуємо batch
     if include_availability and products:
-        # Batch запит: підрахунок SoftReservation для всіх товарів одразу
-        product_ids = [p.product_id for p in products]
-        
-        # Активні м'які резервації (в мудбордах з датами оренди)
-        soft_reservations_query = select(
-            SoftReservation.product_id,
-            func.sum(SoftReservation.quantity).label('reserved')
-        ).where(
-            and_(
-                SoftReservation.product_id.in_(product_ids),
-                SoftReservation.status == 'active',
-                SoftReservation.expires_at >= datetime.utcnow()
-            )
-        ).group_by(SoftReservation.product_id)
-        
-        soft_result = await db.execute(soft_reservations_query)
-        soft_reserved_dict = {row.product_id: int(row.reserved) for row in soft_result}
-        
-        # TODO: Додати підрахунок товарів на мийці/хімчистці/реставрації
-        # Якщо буде таблиця product_cleaning_status:
-        # cleaning_query = select(product_id, 1).where(status IN ('washing', 'repair', 'dry_cleaning'))
-        # cleaning_dict = {row[0]: 1 for row in cleaning_result}
-        
-        # Додати доступність до кожного продукту
-        products_with_availability = []
-        for product in products:
-            product_dict = {
-                "product_id": product.product_id,
-                "sku": product.sku,
-                "name": product.name,
-                "category_id": product.category_id,
-                "category_name": product.category_name,
-                "subcategory_id": product.subcategory_id,
-                "subcategory_name": product.subcategory_name,
-                "rental_price": float(product.rental_price) if product.rental_price else 0.0,
-                "image_url": product.image_url,
-                "color": product.color,
-                "material": product.material,
-                "size": product.size,
-                "status": product.status,
-                
-                # Статистика доступності
-                "quantity": product.quantity or 0,
-                "frozen_quantity": product.frozen_quantity or 0,
-                "reserved": soft_reserved_dict.get(product.product_id, 0),
-                "available": max(0, 
-                    (product.quantity or 0) - 
-                    (product.frozen_quantity or 0) - 
-                    soft_reserved_dict.get(product.product_id, 0)
-                ),
-                # TODO: додати in_cleaning, in_repair коли буде таблиця
-            }
-            products_with_availability.append(ProductListItem(**product_dict))
-        
-        return products_with_availability
+        products = await _products_with_availability(db, products, period)
+    
+    if cursor_mode:
+        return {"items": products, "next_cursor": next_cursor}
     
     return products
 
+@api_router.get("/products/facets", response_model=ProductFacets)
+async def get_product_facets(
+    search: Optional[str] = None,
+    category_id: Optional[int] = None,
+    category_name: Optional[str] = None,
+    subcategory_name: Optional[str] = None,
+    color: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Кількість товарів по категоріях, підкатегоріях, кольорах і матеріалах
+    для тих самих фільтрів, що й GET /products, плюс діапазон цін.
+    Рахується перетином множин з індексу фасетів у snapshot каталогу;
+    з CATALOG_SNAPSHOT_ENABLED=0 - з актуальних рядків MySQL.
+    """
+    
+    selected = dict(
+        category_name=category_name,
+        subcategory_name=subcategory_name,
+        color=color,
+        material=material,
+    )
+    
+    if not CATALOG_SNAPSHOT_ENABLED:
+        # Snapshot ніхто не оновлює - одна вибірка активних товарів за пошуком і категорією,
+        # далі той самий підрахунок, що й у snapshot
+        query = select(
+            Product.product_id, Product.category_id, Product.rental_price, *[getattr(Product, field) for field in FACET_FIELDS]
+        ).where(Product.status == 1)
+        if search:
+            query = query.where(_product_search_condition(search))
+        if category_id:
+            query = query.where(Product.category_id == category_id)
+        index = FacetIndex((await db.execute(query)).all())
+        return index.counts(index.all_ids, selected, min_price=min_price, max_price=max_price)
+    
+    await catalog.ensure_loaded(db)
+    
+    return catalog.facets(
+        search=search,
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        **selected,
+    )
+
 @api_router.get("/products/{product_id}", response_model=ProductDetail)
 async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
     """Отримати деталі товару"""
     
-    result = await db.execute(select(Product).where(Product.product_id == product_id))
-    product = result.scalar_one_or_none()
+    if catalog.is_ready:
+        product = catalog.get(product_id)
+    else:
+        result = await db.execute(select(Product).where(Product.product_id == product_id))
+        product = result.scalar_one_or_none()
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     return product
 
-@api_router.post("/products/check-availability", response_model=AvailabilityCheckResponse)
-async def check_product_availability(
-    request: AvailabilityCheckRequest,
-    db: AsyncSession = Depends(get_db)
-):
-    """Перевірити доступність товару на дати"""
+async def _load_products(db: AsyncSession, product_ids) -> dict:
+    """Товари за списком ID одним запитом (або зі snapshot каталогу)"""
     
-    # Get product
-    result = await db.execute(select(Product).where(Product.product_id == request.product_id))
-    product = result.scalar_one_or_none()
+    if catalog.is_ready:
+        return {pid: catalog.get(pid) for pid in product_ids if catalog.get(pid) is not None}
     
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    if not product_ids:
+        return {}
+    result = await db.execute(select(Product).where(Product.product_id.in_(list(product_ids))))
+    return {product.product_id: product for product in result.scalars().all()}
+
+async def _reserved_quantities_db(db: AsyncSession, checks: List[AvailabilityCheckRequest]) -> List[int]:
+    """
+    Hard + soft резерви для кількох перевірок напряму з БД (дати поза вікном таймлайнів).
+    Два згруповані запити на всі перевірки: резерви групуються по (product_id, дати)
+    в межах загального діапазону, максимум по днях кожної перевірки рахується в Python.
+    """
     
-    total_quantity = product.quantity
-    frozen_quantity = product.frozen_quantity or 0
+    product_ids = list({check.product_id for check in checks})
+    window_from = min(check.reserved_from for check in checks)
+    window_until = max(check.reserved_until for check in checks)
     
     # Get hard reservations (from orders)
-    hard_reservations_query = select(func.sum(ProductReservation.quantity)).where(
+    hard_reservations_query = select(
+        ProductReservation.product_id,
+        ProductReservation.reserved_from,
+        ProductReservation.reserved_until,
+        func.sum(ProductReservation.quantity).label('quantity')
+    ).where(
         and_(
-            ProductReservation.product_id == request.product_id,
+            ProductReservation.product_id.in_(product_ids),
             ProductReservation.status == 'active',
-            or_(
-                and_(
-                    ProductReservation.reserved_from <= request.reserved_until,
-                    ProductReservation.reserved_until >= request.reserved_from
-                )
-            )
+            ProductReservation.reserved_from <= window_until,
+            ProductReservation.reserved_until >= window_from
         )
+    ).group_by(
+        ProductReservation.product_id, ProductReservation.reserved_from, ProductReservation.reserved_until
     )
-    result = await db.execute(hard_reservations_query)
-    hard_reserved = result.scalar() or 0
     
     # Get soft reservations (from event boards)
-    soft_reservations_query = select(func.sum(SoftReservation.quantity)).where(
+    soft_reservations_query = select(
+        SoftReservation.product_id,
+        SoftReservation.reserved_from,
+        SoftReservation.reserved_until,
+        func.sum(SoftReservation.quantity).label('quantity')
+    ).where(
         and_(
-            SoftReservation.product_id == request.product_id,
+            SoftReservation.product_id.in_(product_ids),
             SoftReservation.status == 'active',
             SoftReservation.expires_at > datetime.utcnow(),
-            or_(
-                and_(
-                    SoftReservation.reserved_from <= request.reserved_until,
-                    SoftReservation.reserved_until >= request.reserved_from
-                )
-            )
+            SoftReservation.reserved_from <= window_until,
+            SoftReservation.reserved_until >= window_from
         )
+    ).group_by(
+        SoftReservation.product_id, SoftReservation.reserved_from, SoftReservation.reserved_until
     )
-    result = await db.execute(soft_reservations_query)
-    soft_reserved = result.scalar() or 0
     
-    # Calculate available quantity
-    available_quantity = total_quantity - frozen_quantity - hard_reserved - soft_reserved
-    is_available = available_quantity >= request.quantity
+    windows = {}
+    for query in (hard_reservations_query, soft_reservations_query):
+        result = await db.execute(query)
+        for row in result.all():
+            windows.setdefault(row.product_id, []).append(
+                (row.reserved_from, row.reserved_until, int(row.quantity or 0))
+            )
     
-    message = None
-    if not is_available:
-        if available_quantity > 0:
-            message = f"Доступно лише {available_quantity} шт на ці дати"
+    # Як і таймлайни - максимум зайнятості по днях, а не сума всіх резервів, що перетинаються:
+    # рядок sweep = номер перевірки, резерви обрізані до її дат
+    intervals = []
+    for i, check in enumerate(checks):
+        for reserved_from, reserved_until, quantity in windows.get(check.product_id, ()):
+            start = max(reserved_from, check.reserved_from)
+            end = min(reserved_until, check.reserved_until)
+            if start <= end:
+                intervals.append((i, (start - window_from).days, (end - window_from).days, quantity))
+    occupancy = sweep_occupancy(intervals, (window_until - window_from).days + 1)
+    
+    return [int(occupancy[i].max()) if i in occupancy else 0 for i in range(len(checks))]
+
+async def _check_availability(db: AsyncSession, checks: List[AvailabilityCheckRequest]) -> List[Optional[dict]]:
+    """
+    Доступність для списку перевірок за сталу кількість запитів.
+    None на місці перевірки - товар не знайдено.
+    """
+    
+    products = await _load_products(db, {check.product_id for check in checks})
+    
+    # Дати у вікні таймлайнів рахуються в пам'яті, решта - згрупованими запитами
+    db_positions = [
+        i for i, check in enumerate(checks)
+        if check.product_id in products and not availability.covers(check.reserved_from, check.reserved_until)
+    ]
+    db_reserved = {}
+    if db_positions:
+        quantities = await _reserved_quantities_db(db, [checks[i] for i in db_positions])
+        db_reserved = dict(zip(db_positions, quantities))
+    
+    results = []
+    for i, check in enumerate(checks):
+        product = products.get(check.product_id)
+        if product is None:
+            results.append(None)
+            continue
+        
+        if i in db_reserved:
+            reserved = db_reserved[i]
         else:
-            message = "Товар недоступний на ці дати"
+            # Таймлайн зайнятості: максимум по днях діапазону, без запитів до БД
+            reserved = availability.reserved(check.product_id, check.reserved_from, check.reserved_until)
+        
+        # Calculate available quantity
+        available_quantity = (product.quantity or 0) - (product.frozen_quantity or 0) - reserved
+        is_available = available_quantity >= check.quantity
+        
+        message = None
+        if not is_available:
+            if available_quantity > 0:
+                message = f"Доступно лише {available_quantity} шт на ці дати"
+            else:
+                message = "Товар недоступний на ці дати"
+        
+        results.append({
+            "product_id": check.product_id,
+            "requested_quantity": check.quantity,
+            "available_quantity": max(0, available_quantity),
+            "is_available": is_available,
+            "message": message
+        })
+    
+    return results
+
+@api_router.post("/products/check-availability", response_model=AvailabilityCheckResponse)
+async def check_product_availability(
+    request: AvailabilityCheckRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Перевірити доступність товару на дати"""
     
-    return {
-        "product_id": request.product_id,
-        "requested_quantity": request.quantity,
-        "available_quantity": max(0, available_quantity),
-        "is_available": is_available,
-        "message": message
-    }
+    results = await _check_availability(db, [request])
+    
+    if results[0] is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return results[0]
+
+@api_router.post("/products/check-availability/batch", response_model=List[AvailabilityCheckResponse])
+async def check_products_availability_batch(
+    requests: List[AvailabilityCheckRequest],
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Перевірити доступність багатьох товарів на дати за один запит
+    (наприклад, усього мудборду). Результати - в порядку запиту.
+    """
+    
+    if not requests:
+        return []
+    
+    results = await _check_availability(db, requests)
+    
+    return [
+        result if result is not None else {
+            "product_id": check.product_id,
+            "requested_quantity": check.quantity,
+            "available_quantity": 0,
+            "is_available": False,
+            "message": "Товар не знайдено"
+        }
+        for check, result in zip(requests, results)
+    ]
+
+# Максимальна довжина календаря доступності за один запит
+AVAILABILITY_CALENDAR_MAX_DAYS = 366
+
+async def _availability_calendars(
+    db: AsyncSession,
+    products: List,
+    date_from: date,
+    date_to: date,
+    exclude_board_id: Optional[str] = None
+) -> List[dict]:
+    """
+    Доступна кількість товарів на кожен день [date_from, date_to].
+    У вікні таймлайнів - зріз таймлайну; інакше резерви за період вибираються
+    двома запитами і розкладаються по днях векторизованим difference-array sweep.
+    """
+    
+    days = (date_to - date_from).days + 1
+    product_ids = [p.product_id for p in products]
+    
+    if availability.covers(date_from, date_to):
+        occupancy = {
+            pid: availability.daily_reserved(pid, date_from, date_to, exclude_board_id)
+            for pid in product_ids
+        }
+    else:
+        soft_conditions = [
+            SoftReservation.product_id.in_(product_ids),
+            SoftReservation.status == 'active',
+            SoftReservation.expires_at > datetime.utcnow(),
+            SoftReservation.reserved_from <= date_to,
+            SoftReservation.reserved_until >= date_from
+        ]
+        if exclude_board_id:
+            soft_conditions.append(SoftReservation.board_id != exclude_board_id)
+        
+        intervals = []
+        for query in (
+            select(
+                ProductReservation.product_id, ProductReservation.reserved_from,
+                ProductReservation.reserved_until, ProductReservation.quantity
+            ).where(
+                and_(
+                    ProductReservation.product_id.in_(product_ids),
+                    ProductReservation.status == 'active',
+                    ProductReservation.reserved_from <= date_to,
+                    ProductReservation.reserved_until >= date_from
+                )
+            ),
+            select(
+                SoftReservation.product_id, SoftReservation.reserved_from,
+                SoftReservation.reserved_until, SoftReservation.quantity
+            ).where(and_(*soft_conditions)),
+        ):
+            result = await db.execute(query)
+            for row in result.all():
+                start = max((row.reserved_from - date_from).days, 0)
+                end = min((row.reserved_until - date_from).days, days - 1)
+                # Рядок з reserved_until < reserved_from пропускається, як і в таймлайнах:
+                # sweep відняв би кількість раніше, ніж додав
+                if start <= end:
+                    intervals.append((row.product_id, start, end, row.quantity or 0))
+        occupancy = sweep_occupancy(intervals, days)
+    
+    calendars = []
+    for product in products:
+        free = (product.quantity or 0) - (product.frozen_quantity or 0)
+        reserved = occupancy.get(product.product_id)
+        available = [free] * days if reserved is None else (free - reserved).tolist()
+        calendars.append({
+            "product_id": product.product_id,
+            "total_quantity": product.quantity or 0,
+            "date_from": date_from,
+            "date_to": date_to,
+            "days": [
+                {"date": date_from + timedelta(days=i), "available": max(0, int(quantity))}
+                for i, quantity in enumerate(available)
+            ]
+        })
+    
+    return calendars
+
+def _validate_calendar_range(date_from: date, date_to: date):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be earlier than 'from'")
+    if (date_to - date_from).days + 1 > AVAILABILITY_CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Calendar range is limited to {AVAILABILITY_CALENDAR_MAX_DAYS} days"
+        )
+
+@api_router.get("/products/{product_id}/availability-calendar", response_model=AvailabilityCalendar)
+async def get_product_availability_calendar(
+    product_id: int,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Доступна кількість товару на кожен день періоду (для DateRangePicker)"""
+    
+    _validate_calendar_range(date_from, date_to)
+    
+    products = await _load_products(db, [product_id])
+    if product_id not in products:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    calendars = await _availability_calendars(db, [products[product_id]], date_from, date_to)
+    return calendars[0]
 
 # ============================================================================
 # EVENT BOARDS ENDPOINTS  
@@ -476,60 +1108,52 @@ async def get_event_boards(
     result = await db.execute(query)
     boards = result.scalars().all()
     
-    # Manually construct response with items
-    response_boards = []
-    for board in boards:
-        items_result = await db.execute(
-            select(EventBoardItem).where(EventBoardItem.board_id == board.id).order_by(EventBoardItem.position)
+    # Items and products for all boards are loaded in one batched query
+    return await load_boards(db, boards)
+
+@api_router.get("/boards/summary", response_model=List[EventBoardSummary])
+async def get_event_board_summaries(
+    status: Optional[str] = None,
+    current_user: Customer = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Короткий список мудбордів (без товарів) з кількістю позицій - одним запитом"""
+    
+    query = (
+        select(
+            EventBoard.id,
+            EventBoard.board_name,
+            EventBoard.event_date,
+            EventBoard.event_type,
+            EventBoard.rental_start_date,
+            EventBoard.rental_end_date,
+            EventBoard.rental_days,
+            EventBoard.status,
+            EventBoard.cover_image,
+            EventBoard.estimated_total,
+            EventBoard.updated_at,
+            func.count(EventBoardItem.id).label('items_count'),
+            func.coalesce(func.sum(EventBoardItem.quantity), 0).label('total_quantity')
         )
-        items = items_result.scalars().all()
-        
-        # Load product details for each item
-        item_list = []
-        for item in items:
-            product_result = await db.execute(
-                select(Product).where(Product.product_id == item.product_id)
-            )
-            product = product_result.scalar_one_or_none()
-            
-            # Create dict with item and product
-            item_dict = {
-                'id': item.id,
-                'board_id': item.board_id,
-                'product_id': item.product_id,
-                'quantity': item.quantity,
-                'notes': item.notes,
-                'section': item.section,
-                'position': item.position,
-                'added_at': item.added_at,
-                'product': product
-            }
-            item_list.append(item_dict)
-        
-        # Create board dict with items
-        board_dict = {
-            'id': board.id,
-            'customer_id': board.customer_id,
-            'board_name': board.board_name,
-            'event_date': board.event_date,
-            'event_type': board.event_type,
-            'rental_start_date': board.rental_start_date,
-            'rental_end_date': board.rental_end_date,
-            'rental_days': board.rental_days,
-            'status': board.status,
-            'notes': board.notes,
-            'cover_image': board.cover_image,
-            'budget': board.budget,
-            'estimated_total': board.estimated_total,
-            'canvas_layout': board.canvas_layout,
-            'created_at': board.created_at,
-            'updated_at': board.updated_at,
-            'converted_to_order_id': board.converted_to_order_id,
-            'items': item_list
-        }
-        response_boards.append(board_dict)
+        .outerjoin(EventBoardItem, EventBoardItem.board_id == EventBoard.id)
+        .where(EventBoard.customer_id == current_user.customer_id)
+        .group_by(EventBoard.id)
+    )
+    
+    if status:
+        query = query.where(EventBoard.status == status)
     
-    return response_boards
+    query = query.order_by(EventBoard.updated_at.desc())
+    
+    result = await db.execute(query)
+    return [
+        {
+            **row._mapping,
+            'cover_image': cover_image_url(row.cover_image),
+            'cover_variants': cover_urls(row.cover_image)
+        }
+        for row in result.all()
+    ]
 
 @api_router.post("/boards", response_model=EventBoardResponse, status_code=status.HTTP_201_CREATED)
 async def create_event_board(
@@ -560,41 +1184,155 @@ async def create_event_board(
         updated_at=datetime.utcnow()
     )
     
-    db.add(new_board)
-    await db.commit()
-    await db.refresh(new_board)
+    db.add(new_board)
+    await db.commit()
+    await db.refresh(new_board)
+    
+    logger.info(f"Event board created: {new_board.id} by customer {current_user.customer_id}")
+    
+    # Return board as dict with empty items list
+    return board_to_dict(new_board, [])
+
+@api_router.get("/boards/{board_id}", response_model=EventBoardResponse)
+async def get_event_board(
+    board_id: str,
+    current_user: Customer = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Отримати деталі мудборду"""
+    
+    result = await db.execute(
+        select(EventBoard).where(
+            and_(
+                EventBoard.id == board_id,
+                EventBoard.customer_id == current_user.customer_id
+            )
+        )
+    )
+    board = result.scalar_one_or_none()
+    
+    if not board:
+        raise HTTPException(status_code=404, detail="Event board not found")
+    
+    return await load_board(db, board)
+
+@api_router.patch("/boards/{board_id}", response_model=EventBoardResponse)
+async def update_event_board(
+    board_id: str,
+    board_data: EventBoardUpdate,
+    current_user: Customer = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Оновити мудборд"""
+    
+    result = await db.execute(
+        select(EventBoard).where(
+            and_(
+                EventBoard.id == board_id,
+                EventBoard.customer_id == current_user.customer_id
+            )
+        )
+    )
+    board = result.scalar_one_or_none()
+    
+    if not board:
+        raise HTTPException(status_code=404, detail="Event board not found")
+    
+    old_rental_days = board.rental_days
+    
+    # Update fields
+    update_data = board_data.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(board, field, value)
+    
+    # Recalculate rental days if dates changed
+    if board.rental_start_date and board.rental_end_date:
+        board.rental_days = (board.rental_end_date - board.rental_start_date).days + 1
+    
+    # Загальна сума пропорційна кількості днів
+    await rescale_for_dates(db, board, old_rental_days)
+    
+    # Повна заміна canvas_layout теж нова ревізія - інакше PATCH canvas-layout не побачить конфлікт
+    if 'canvas_layout' in update_data:
+        board.canvas_revision = (board.canvas_revision or 0) + 1
+    
+    board.updated_at = datetime.utcnow()
+    
+    await db.commit()
+    await db.refresh(board)
+    
+    return await load_board(db, board)
+
+@api_router.patch("/boards/{board_id}/canvas-layout", response_model=CanvasLayoutRevision)
+async def patch_canvas_layout(
+    board_id: str,
+    layout_patch: CanvasLayoutPatch,
+    current_user: Customer = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Змінити canvas_layout операціями JSON Patch (RFC 6902).
+    revision - ревізія, від якої клієнт рахував зміни; якщо layout вже змінили - 409.
+    Повертає тільки нову ревізію, без мудборду і товарів.
+    """
+    
+    result = await db.execute(
+        select(EventBoard.canvas_layout, EventBoard.canvas_revision).where(
+            and_(
+                EventBoard.id == board_id,
+                EventBoard.customer_id == current_user.customer_id
+            )
+        )
+    )
+    row = result.first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Event board not found")
+    
+    if row.canvas_revision != layout_patch.revision:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Canvas layout was changed (current revision {row.canvas_revision})"
+        )
+    
+    try:
+        layout = apply_patch(
+            row.canvas_layout or {},
+            [operation.model_dump(by_alias=True, exclude_unset=True) for operation in layout_patch.operations]
+        )
+    except JsonPatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Умовний UPDATE: запис між SELECT і UPDATE з іншої вкладки теж дає 409
+    new_revision = layout_patch.revision + 1
+    update_result = await db.execute(
+        update(EventBoard)
+        .where(
+            and_(
+                EventBoard.id == board_id,
+                EventBoard.canvas_revision == layout_patch.revision
+            )
+        )
+        .values(canvas_layout=layout, canvas_revision=new_revision, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    
+    if update_result.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Canvas layout was changed")
     
-    logger.info(f"Event board created: {new_board.id} by customer {current_user.customer_id}")
+    await db.commit()
     
-    # Return board as dict with empty items list
-    return {
-        'id': new_board.id,
-        'customer_id': new_board.customer_id,
-        'board_name': new_board.board_name,
-        'event_date': new_board.event_date,
-        'event_type': new_board.event_type,
-        'rental_start_date': new_board.rental_start_date,
-        'rental_end_date': new_board.rental_end_date,
-        'rental_days': new_board.rental_days,
-        'status': new_board.status,
-        'notes': new_board.notes,
-        'cover_image': new_board.cover_image,
-        'budget': new_board.budget,
-        'estimated_total': new_board.estimated_total,
-        'canvas_layout': new_board.canvas_layout,
-        'created_at': new_board.created_at,
-        'updated_at': new_board.updated_at,
-        'converted_to_order_id': new_board.converted_to_order_id,
-        'items': []
-    }
+    return {"revision": new_revision}
 
-@api_router.get("/boards/{board_id}", response_model=EventBoardResponse)
-async def get_event_board(
+@api_router.post("/boards/{board_id}/cover", response_model=BoardCoverResponse)
+async def upload_board_cover(
     board_id: str,
+    file: UploadFile = File(...),
     current_user: Customer = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Отримати деталі мудборду"""
+    """Завантажити обкладинку мудборду (у БД зберігається тільки ключ файлу)"""
     
     result = await db.execute(
         select(EventBoard).where(
@@ -609,63 +1347,45 @@ async def get_event_board(
     if not board:
         raise HTTPException(status_code=404, detail="Event board not found")
     
-    # Load items
-    items_result = await db.execute(
-        select(EventBoardItem).where(EventBoardItem.board_id == board.id).order_by(EventBoardItem.position)
-    )
-    items = items_result.scalars().all()
+    try:
+        board.cover_image = await save_cover(file)
+    except CoverImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Load product details
-    item_list = []
-    for item in items:
-        product_result = await db.execute(
-            select(Product).where(Product.product_id == item.product_id)
-        )
-        product = product_result.scalar_one_or_none()
-        
-        item_dict = {
-            'id': item.id,
-            'board_id': item.board_id,
-            'product_id': item.product_id,
-            'quantity': item.quantity,
-            'notes': item.notes,
-            'section': item.section,
-            'position': item.position,
-            'added_at': item.added_at,
-            'product': product
-        }
-        item_list.append(item_dict)
+    board.updated_at = datetime.utcnow()
+    await db.commit()
+    
+    logger.info(f"Cover uploaded for board {board_id}: {board.cover_image}")
     
-    # Return board as dict
     return {
-        'id': board.id,
-        'customer_id': board.customer_id,
-        'board_name': board.board_name,
-        'event_date': board.event_date,
-        'event_type': board.event_type,
-        'rental_start_date': board.rental_start_date,
-        'rental_end_date': board.rental_end_date,
-        'rental_days': board.rental_days,
-        'status': board.status,
-        'notes': board.notes,
-        'cover_image': board.cover_image,
-        'budget': board.budget,
-        'estimated_total': board.estimated_total,
-        'canvas_layout': board.canvas_layout,
-        'created_at': board.created_at,
-        'updated_at': board.updated_at,
-        'converted_to_order_id': board.converted_to_order_id,
-        'items': item_list
+        "cover_image": cover_image_url(board.cover_image),
+        "cover_variants": cover_urls(board.cover_image)
     }
 
-@api_router.patch("/boards/{board_id}", response_model=EventBoardResponse)
-async def update_event_board(
+@api_router.get("/covers/{key}/{variant}.webp")
+async def get_cover(key: str, variant: str):
+    """Варіант обкладинки; вміст за ключем не змінюється, тому кешується назавжди"""
+    
+    if not is_valid_key(key) or variant not in COVER_VARIANTS:
+        raise HTTPException(status_code=404, detail="Cover not found")
+    
+    path = variant_path(key, variant)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Cover not found")
+    
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+@api_router.delete("/boards/{board_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_event_board(
     board_id: str,
-    board_data: EventBoardUpdate,
     current_user: Customer = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Оновити мудборд"""
+    """Видалити мудборд"""
     
     result = await db.execute(
         select(EventBoard).where(
@@ -680,76 +1400,26 @@ async def update_event_board(
     if not board:
         raise HTTPException(status_code=404, detail="Event board not found")
     
-    # Update fields
-    update_data = board_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(board, field, value)
-    
-    # Recalculate rental days if dates changed
-    if board.rental_start_date and board.rental_end_date:
-        board.rental_days = (board.rental_end_date - board.rental_start_date).days + 1
-    
-    board.updated_at = datetime.utcnow()
-    
+    await db.delete(board)
     await db.commit()
-    await db.refresh(board)
-    
-    # Load items
-    items_result = await db.execute(
-        select(EventBoardItem).where(EventBoardItem.board_id == board.id)
-    )
-    items = items_result.scalars().all()
     
-    # Load product details
-    item_list = []
-    for item in items:
-        product_result = await db.execute(
-            select(Product).where(Product.product_id == item.product_id)
-        )
-        product = product_result.scalar_one_or_none()
-        
-        item_dict = {
-            'id': item.id,
-            'board_id': item.board_id,
-            'product_id': item.product_id,
-            'quantity': item.quantity,
-            'notes': item.notes,
-            'section': item.section,
-            'position': item.position,
-            'added_at': item.added_at,
-            'product': product
-        }
-        item_list.append(item_dict)
+    availability.remove_board_soft(board_id)
     
-    # Return board as dict
-    return {
-        'id': board.id,
-        'customer_id': board.customer_id,
-        'board_name': board.board_name,
-        'event_date': board.event_date,
-        'event_type': board.event_type,
-        'rental_start_date': board.rental_start_date,
-        'rental_end_date': board.rental_end_date,
-        'rental_days': board.rental_days,
-        'status': board.status,
-        'notes': board.notes,
-        'cover_image': board.cover_image,
-        'budget': board.budget,
-        'estimated_total': board.estimated_total,
-        'canvas_layout': board.canvas_layout,
-        'created_at': board.created_at,
-        'updated_at': board.updated_at,
-        'converted_to_order_id': board.converted_to_order_id,
-        'items': item_list
-    }
+    logger.info(f"Event board deleted: {board_id}")
+    return
 
-@api_router.delete("/boards/{board_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_event_board(
+@api_router.get("/boards/{board_id}/availability-calendar", response_model=List[AvailabilityCalendar])
+async def get_board_availability_calendar(
     board_id: str,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
     current_user: Customer = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Видалити мудборд"""
+    """
+    Календар доступності для всіх товарів мудборду.
+    За замовчуванням - дати оренди мудборду; власні м'які резерви мудборду не враховуються.
+    """
     
     result = await db.execute(
         select(EventBoard).where(
@@ -764,11 +1434,22 @@ async def delete_event_board(
     if not board:
         raise HTTPException(status_code=404, detail="Event board not found")
     
-    await db.delete(board)
-    await db.commit()
+    date_from = date_from or board.rental_start_date
+    date_to = date_to or board.rental_end_date
+    if not date_from or not date_to:
+        raise HTTPException(status_code=400, detail="Specify 'from' and 'to' or set board rental dates")
+    _validate_calendar_range(date_from, date_to)
     
-    logger.info(f"Event board deleted: {board_id}")
-    return
+    items_result = await db.execute(
+        select(EventBoardItem.product_id).where(EventBoardItem.board_id == board_id).distinct()
+    )
+    product_ids = [row.product_id for row in items_result.all()]
+    products = await _load_products(db, product_ids)
+    
+    return await _availability_calendars(
+        db, [products[pid] for pid in product_ids if pid in products], date_from, date_to,
+        exclude_board_id=board_id
+    )
 
 # ============================================================================
 # EVENT BOARD ITEMS ENDPOINTS
@@ -783,110 +1464,75 @@ async def add_item_to_board(
 ):
     """Додати товар до мудборду"""
     
-    # Check if board exists and belongs to user
-    board_result = await db.execute(
-        select(EventBoard).where(
+    # Board ownership, product and existing item in one query
+    result = await db.execute(
+        select(EventBoard, Product, EventBoardItem)
+        .select_from(EventBoard)
+        .outerjoin(Product, Product.product_id == item_data.product_id)
+        .outerjoin(
+            EventBoardItem,
+            and_(
+                EventBoardItem.board_id == EventBoard.id,
+                EventBoardItem.product_id == item_data.product_id
+            )
+        )
+        .where(
             and_(
                 EventBoard.id == board_id,
                 EventBoard.customer_id == current_user.customer_id
             )
         )
     )
-    board = board_result.scalar_one_or_none()
+    row = result.first()
     
-    if not board:
+    if not row:
         raise HTTPException(status_code=404, detail="Event board not found")
     
-    # Check if product exists
-    product_result = await db.execute(
-        select(Product).where(Product.product_id == item_data.product_id)
-    )
-    product = product_result.scalar_one_or_none()
+    board, product, item = row
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Check if item already exists in board
-    existing_item_result = await db.execute(
-        select(EventBoardItem).where(
-            and_(
-                EventBoardItem.board_id == board_id,
-                EventBoardItem.product_id == item_data.product_id
-            )
-        )
-    )
-    existing_item = existing_item_result.scalar_one_or_none()
-    
-    if existing_item:
+    if item:
         # Update quantity
-        existing_item.quantity += item_data.quantity
-        existing_item.notes = item_data.notes or existing_item.notes
-        existing_item.section = item_data.section or existing_item.section
-        await db.commit()
-        await db.refresh(existing_item)
-        
-        # Create/update soft reservation if dates are set
-        if board.rental_start_date and board.rental_end_date:
-            await _create_or_update_soft_reservation(
-                db, board, product, existing_item.quantity, current_user.customer_id
-            )
-        
-        # Return as dict
-        return {
-            'id': existing_item.id,
-            'board_id': existing_item.board_id,
-            'product_id': existing_item.product_id,
-            'quantity': existing_item.quantity,
-            'notes': existing_item.notes,
-            'section': existing_item.section,
-            'position': existing_item.position,
-            'added_at': existing_item.added_at,
-            'product': product
-        }
-    
-    # Create new item
-    new_item = EventBoardItem(
-        id=str(uuid.uuid4()),
-        board_id=board_id,
-        product_id=item_data.product_id,
-        quantity=item_data.quantity,
-        notes=item_data.notes,
-        section=item_data.section,
-        position=0,
-        added_at=datetime.utcnow()
-    )
-    
-    db.add(new_item)
+        item.quantity += item_data.quantity
+        item.notes = item_data.notes or item.notes
+        item.section = item_data.section or item.section
+    else:
+        # Create new item
+        item = EventBoardItem(
+            id=str(uuid.uuid4()),
+            board_id=board_id,
+            product_id=item_data.product_id,
+            quantity=item_data.quantity,
+            notes=item_data.notes,
+            section=item_data.section,
+            position=0,
+            added_at=datetime.utcnow()
+        )
+        db.add(item)
     
     # Update board estimated total
-    if product.rental_price and board.rental_days:
-        board.estimated_total = (board.estimated_total or 0) + (product.rental_price * item_data.quantity * board.rental_days)
-    
+    apply_item_delta(board, product.rental_price, item_data.quantity)
     board.updated_at = datetime.utcnow()
     
+    # Create/update soft reservation if dates are set (flushes the item first)
+    expires_at = None
+    if board.rental_start_date and board.rental_end_date:
+        expires_at = await _upsert_soft_reservation(
+            db, board, product.product_id, item.quantity, current_user.customer_id
+        )
+    
     await db.commit()
-    await db.refresh(new_item)
     
-    # Create soft reservation if dates are set
-    if board.rental_start_date and board.rental_end_date:
-        await _create_or_update_soft_reservation(
-            db, board, product, new_item.quantity, current_user.customer_id
+    if expires_at:
+        availability.set_soft(
+            board.id, product.product_id, board.rental_start_date, board.rental_end_date, item.quantity, expires_at
         )
     
     logger.info(f"Item added to board: {board_id}, product: {item_data.product_id}")
     
-    # Return as dict
-    return {
-        'id': new_item.id,
-        'board_id': new_item.board_id,
-        'product_id': new_item.product_id,
-        'quantity': new_item.quantity,
-        'notes': new_item.notes,
-        'section': new_item.section,
-        'position': new_item.position,
-        'added_at': new_item.added_at,
-        'product': product
-    }
+    return item_to_dict(item, product)
 
 @api_router.patch("/boards/{board_id}/items/{item_id}", response_model=EventBoardItemResponse)
 async def update_board_item(
@@ -898,70 +1544,54 @@ async def update_board_item(
 ):
     """Оновити товар в мудборді"""
     
-    # Check board ownership
-    board_result = await db.execute(
-        select(EventBoard).where(
-            and_(
-                EventBoard.id == board_id,
-                EventBoard.customer_id == current_user.customer_id
-            )
-        )
-    )
-    board = board_result.scalar_one_or_none()
-    
-    if not board:
-        raise HTTPException(status_code=404, detail="Event board not found")
-    
-    # Get item
-    item_result = await db.execute(
-        select(EventBoardItem).where(
+    # Item with its board (ownership) and product in one query
+    result = await db.execute(
+        select(EventBoardItem, EventBoard, Product)
+        .select_from(EventBoardItem)
+        .join(EventBoard, EventBoard.id == EventBoardItem.board_id)
+        .outerjoin(Product, Product.product_id == EventBoardItem.product_id)
+        .where(
             and_(
                 EventBoardItem.id == item_id,
-                EventBoardItem.board_id == board_id
+                EventBoardItem.board_id == board_id,
+                EventBoard.customer_id == current_user.customer_id
             )
         )
     )
-    item = item_result.scalar_one_or_none()
+    row = result.first()
     
-    if not item:
+    if not row:
         raise HTTPException(status_code=404, detail="Item not found")
     
+    item, board, product = row
+    old_quantity = item.quantity
+    
     # Update fields
     update_data = item_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(item, field, value)
     
+    if product:
+        apply_item_delta(board, product.rental_price, item.quantity - old_quantity)
     board.updated_at = datetime.utcnow()
     
-    await db.commit()
-    await db.refresh(item)
-    
-    # Load product
-    product_result = await db.execute(
-        select(Product).where(Product.product_id == item.product_id)
-    )
-    product = product_result.scalar_one_or_none()
-    
     # Update soft reservation
+    expires_at = None
     if board.rental_start_date and board.rental_end_date:
-        await _create_or_update_soft_reservation(
-            db, board, product, item.quantity, current_user.customer_id
+        expires_at = await _upsert_soft_reservation(
+            db, board, item.product_id, item.quantity, current_user.customer_id
+        )
+    
+    await db.commit()
+    
+    if expires_at:
+        availability.set_soft(
+            board.id, item.product_id, board.rental_start_date, board.rental_end_date, item.quantity, expires_at
         )
     
     logger.info(f"Item {item_id} quantity updated to {item.quantity} in board {board_id}")
     
-    # Return as dict
-    return {
-        'id': item.id,
-        'board_id': item.board_id,
-        'product_id': item.product_id,
-        'quantity': item.quantity,
-        'notes': item.notes,
-        'section': item.section,
-        'position': item.position,
-        'added_at': item.added_at,
-        'product': product
-    }
+    return item_to_dict(item, product)
 
 @api_router.delete("/boards/{board_id}/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_board_item(
@@ -972,104 +1602,255 @@ async def delete_board_item(
 ):
     """Видалити товар з мудборду"""
     
-    # Check board ownership
-    board_result = await db.execute(
-        select(EventBoard).where(
-            and_(
-                EventBoard.id == board_id,
-                EventBoard.customer_id == current_user.customer_id
-            )
-        )
-    )
-    board = board_result.scalar_one_or_none()
-    
-    if not board:
-        raise HTTPException(status_code=404, detail="Event board not found")
-    
-    # Get item
-    item_result = await db.execute(
-        select(EventBoardItem).where(
+    # Item with its board (ownership) and product price in one query
+    result = await db.execute(
+        select(EventBoardItem, EventBoard, Product.rental_price)
+        .select_from(EventBoardItem)
+        .join(EventBoard, EventBoard.id == EventBoardItem.board_id)
+        .outerjoin(Product, Product.product_id == EventBoardItem.product_id)
+        .where(
             and_(
                 EventBoardItem.id == item_id,
-                EventBoardItem.board_id == board_id
+                EventBoardItem.board_id == board_id,
+                EventBoard.customer_id == current_user.customer_id
             )
         )
     )
-    item = item_result.scalar_one_or_none()
+    row = result.first()
     
-    if not item:
+    if not row:
         raise HTTPException(status_code=404, detail="Item not found")
     
+    item, board, rental_price = row
+    
     # Delete associated soft reservation
-    soft_reservation_result = await db.execute(
-        select(SoftReservation).where(
+    await db.execute(
+        delete(SoftReservation).where(
             and_(
                 SoftReservation.board_id == board_id,
                 SoftReservation.product_id == item.product_id
             )
         )
     )
-    soft_reservation = soft_reservation_result.scalar_one_or_none()
-    
-    if soft_reservation:
-        await db.delete(soft_reservation)
-        logger.info(f"Soft reservation deleted for product {item.product_id} from board {board_id}")
     
     await db.delete(item)
+    apply_item_delta(board, rental_price, -item.quantity)
     board.updated_at = datetime.utcnow()
     await db.commit()
     
+    availability.remove_soft(board_id, item.product_id)
+    
     logger.info(f"Item {item_id} deleted from board {board_id}")
     
     return
 
-# Helper function
-async def _create_or_update_soft_reservation(
-    db: AsyncSession,
-    board: EventBoard,
-    product: Product,
-    quantity: int,
-    customer_id: int
+# Максимальна кількість операцій в одному POST /boards/{id}/items:batch
+BOARD_ITEMS_BATCH_MAX = 200
+
+@api_router.post("/boards/{board_id}/items:batch", response_model=List[EventBoardItemResponse])
+async def batch_board_items(
+    board_id: str,
+    operations: List[EventBoardItemOperation],
+    current_user: Customer = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Create or update soft reservation"""
+    """
+    Пакетні операції з товарами мудборду (add/update/delete/reorder) в одній транзакції.
+    Операції застосовуються по черзі; якщо хоч одна невалідна - не застосовується жодна.
+    Повертає всі товари мудборду після змін.
+    """
     
-    result = await db.execute(
-        select(SoftReservation).where(
+    if len(operations) > BOARD_ITEMS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Too many operations (max {BOARD_ITEMS_BATCH_MAX})")
+    
+    board_result = await db.execute(
+        select(EventBoard).where(
             and_(
-                SoftReservation.board_id == board.id,
-                SoftReservation.product_id == product.product_id
+                EventBoard.id == board_id,
+                EventBoard.customer_id == current_user.customer_id
             )
         )
     )
-    reservation = result.scalar_one_or_none()
+    board = board_result.scalar_one_or_none()
     
-    expires_at = datetime.utcnow() + timedelta(minutes=int(os.getenv('SOFT_RESERVATION_MINUTES', '30')))
+    if not board:
+        raise HTTPException(status_code=404, detail="Event board not found")
     
-    if reservation:
-        old_quantity = reservation.quantity
-        reservation.quantity = quantity
-        reservation.reserved_from = board.rental_start_date
-        reservation.reserved_until = board.rental_end_date
-        reservation.expires_at = expires_at
-        reservation.status = 'active'
-        logger.info(f"Soft reservation updated: product {product.product_id}, quantity {old_quantity} → {quantity}")
-    else:
-        reservation = SoftReservation(
-            id=str(uuid.uuid4()),
-            board_id=board.id,
-            product_id=product.product_id,
-            quantity=quantity,
-            reserved_from=board.rental_start_date,
-            reserved_until=board.rental_end_date,
-            expires_at=expires_at,
-            customer_id=customer_id,
-            status='active',
-            created_at=datetime.utcnow()
+    items_result = await db.execute(
+        select(EventBoardItem).where(EventBoardItem.board_id == board_id)
+    )
+    items = {item.id: item for item in items_result.scalars().all()}
+    items_by_product = {item.product_id: item for item in items.values()}
+    
+    # Товари для add і ціни змінюваних позицій - одним IN-запитом
+    product_ids = {op.product_id for op in operations if op.op == 'add' and op.product_id is not None}
+    product_ids |= {items[op.item_id].product_id for op in operations if op.item_id in items}
+    products = {}
+    if product_ids:
+        products_result = await db.execute(
+            select(Product).where(Product.product_id.in_(list(product_ids)))
+        )
+        products = {product.product_id: product for product in products_result.scalars().all()}
+    
+    def get_item(item_id: Optional[str]) -> EventBoardItem:
+        item = items.get(item_id)
+        if not item:
+            raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+        return item
+    
+    # product_id, чиї soft reservations треба оновити / видалити
+    reserved_products = set()
+    released_products = set()
+    
+    for index, op in enumerate(operations):
+        if op.op == 'add':
+            if op.product_id is None:
+                raise HTTPException(status_code=400, detail=f"Operation {index}: product_id is required")
+            product = products.get(op.product_id)
+            if not product:
+                raise HTTPException(status_code=404, detail=f"Product {op.product_id} not found")
+            
+            quantity = op.quantity or 1
+            item = items_by_product.get(op.product_id)
+            if item:
+                item.quantity += quantity
+                item.notes = op.notes or item.notes
+                item.section = op.section or item.section
+            else:
+                item = EventBoardItem(
+                    id=str(uuid.uuid4()),
+                    board_id=board_id,
+                    product_id=op.product_id,
+                    quantity=quantity,
+                    notes=op.notes,
+                    section=op.section,
+                    position=0,
+                    added_at=datetime.utcnow()
+                )
+                db.add(item)
+                items[item.id] = item
+                items_by_product[item.product_id] = item
+            
+            apply_item_delta(board, product.rental_price, quantity)
+            reserved_products.add(op.product_id)
+            released_products.discard(op.product_id)
+        
+        elif op.op == 'update':
+            item = get_item(op.item_id)
+            old_quantity = item.quantity
+            for field in ('quantity', 'notes', 'section'):
+                if field in op.model_fields_set and not (field == 'quantity' and op.quantity is None):
+                    setattr(item, field, getattr(op, field))
+            if item.quantity != old_quantity:
+                product = products.get(item.product_id)
+                apply_item_delta(board, product.rental_price if product else None, item.quantity - old_quantity)
+                reserved_products.add(item.product_id)
+        
+        elif op.op == 'delete':
+            item = get_item(op.item_id)
+            product = products.get(item.product_id)
+            apply_item_delta(board, product.rental_price if product else None, -item.quantity)
+            await db.delete(item)
+            del items[item.id]
+            del items_by_product[item.product_id]
+            reserved_products.discard(item.product_id)
+            released_products.add(item.product_id)
+        
+        elif op.op == 'reorder':
+            if not op.item_ids:
+                raise HTTPException(status_code=400, detail=f"Operation {index}: item_ids is required")
+            for position, item_id in enumerate(op.item_ids):
+                get_item(item_id).position = position
+    
+    board.updated_at = datetime.utcnow()
+    
+    # Soft reservations: один DELETE і один багаторядковий upsert
+    if released_products:
+        await db.execute(
+            delete(SoftReservation).where(
+                and_(
+                    SoftReservation.board_id == board_id,
+                    SoftReservation.product_id.in_(list(released_products))
+                )
+            )
+        )
+    
+    expires_at = None
+    if reserved_products and board.rental_start_date and board.rental_end_date:
+        expires_at = await _upsert_soft_reservations(
+            db, board,
+            {product_id: items_by_product[product_id].quantity for product_id in reserved_products},
+            current_user.customer_id
         )
-        db.add(reservation)
-        logger.info(f"Soft reservation created: product {product.product_id}, quantity {quantity}")
     
     await db.commit()
+    
+    for product_id in released_products:
+        availability.remove_soft(board_id, product_id)
+    if expires_at:
+        for product_id in reserved_products:
+            availability.set_soft(
+                board_id, product_id, board.rental_start_date, board.rental_end_date,
+                items_by_product[product_id].quantity, expires_at
+            )
+    
+    logger.info(f"Batch of {len(operations)} item operations applied to board {board_id}")
+    
+    items_by_board = await load_board_items(db, [board_id])
+    return items_by_board[board_id]
+
+# Helper functions
+async def _upsert_soft_reservations(
+    db: AsyncSession,
+    board: EventBoard,
+    quantities: Dict[int, int],
+    customer_id: int
+) -> datetime:
+    """
+    Create or update soft reservations of board items ({product_id: quantity}) with one
+    multi-row INSERT ... ON DUPLICATE KEY UPDATE (unique key board_id + product_id).
+    Runs in the caller's transaction; returns expires_at for availability.set_soft after commit.
+    """
+    expires_at = datetime.utcnow() + timedelta(minutes=int(os.getenv('SOFT_RESERVATION_MINUTES', '30')))
+    created_at = datetime.utcnow()
+    
+    stmt = mysql_insert(SoftReservation).values([
+        {
+            'id': str(uuid.uuid4()),
+            'board_id': board.id,
+            'product_id': product_id,
+            'quantity': quantity,
+            'reserved_from': board.rental_start_date,
+            'reserved_until': board.rental_end_date,
+            'expires_at': expires_at,
+            'customer_id': customer_id,
+            'status': 'active',
+            'created_at': created_at
+        }
+        for product_id, quantity in quantities.items()
+    ])
+    stmt = stmt.on_duplicate_key_update(
+        quantity=stmt.inserted.quantity,
+        reserved_from=stmt.inserted.reserved_from,
+        reserved_until=stmt.inserted.reserved_until,
+        expires_at=stmt.inserted.expires_at,
+        status=stmt.inserted.status
+    )
+    await db.execute(stmt)
+    
+    logger.info(f"Soft reservations saved: board {board.id}, {len(quantities)} products")
+    
+    return expires_at
+
+async def _upsert_soft_reservation(
+    db: AsyncSession,
+    board: EventBoard,
+    product_id: int,
+    quantity: int,
+    customer_id: int
+) -> datetime:
+    """Create or update the soft reservation of one board item (see _upsert_soft_reservations)"""
+    return await _upsert_soft_reservations(db, board, {product_id: quantity}, customer_id)
 
 # ====================
 # ORDER ENDPOINTS
@@ -1117,93 +1898,51 @@ async def convert_board_to_order(
     if not items:
         raise HTTPException(status_code=400, detail="Board has no items")
     
-    # 2. Перевірити availability для всіх товарів
+    # 2. Всі товари мудборду одним IN-запитом
+    needed = {}
     for item in items:
-        # Отримати product
-        product_result = await db.execute(
-            select(Product).where(Product.product_id == item.product_id)
-        )
-        product = product_result.scalar_one_or_none()
-        
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        
-        # Перевірити доступність
-        reserved_query = select(func.sum(ProductReservation.quantity)).where(
-            and_(
-                ProductReservation.product_id == product.product_id,
-                ProductReservation.status == 'active',
-                or_(
-                    and_(
-                        ProductReservation.reserved_from <= board.rental_start_date,
-                        ProductReservation.reserved_until >= board.rental_start_date
-                    ),
-                    and_(
-                        ProductReservation.reserved_from <= board.rental_end_date,
-                        ProductReservation.reserved_until >= board.rental_end_date
-                    ),
-                    and_(
-                        ProductReservation.reserved_from >= board.rental_start_date,
-                        ProductReservation.reserved_until <= board.rental_end_date
-                    )
-                )
-            )
-        )
-        reserved_result = await db.execute(reserved_query)
-        reserved = reserved_result.scalar() or 0
-        
-        available = product.quantity - product.frozen_quantity - reserved
+        needed[item.product_id] = needed.get(item.product_id, 0) + item.quantity
+    
+    products_result = await db.execute(
+        select(Product).where(Product.product_id.in_(list(needed)))
+    )
+    products = {product.product_id: product for product in products_result.scalars().all()}
+    
+    for product_id in needed:
+        if product_id not in products:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    
+    # 3. Перевірити availability для всіх товарів: пік зайнятості по днях (hard + soft інших мудбордів),
+    # як у календарі та batch-перевірці - з таймлайнів або одним згрупованим запитом
+    reserved = await _reserved_for_period(
+        db, board.rental_start_date, board.rental_end_date, list(needed), exclude_board_id=board.id
+    )
+    
+    for product_id, quantity in needed.items():
+        product = products[product_id]
+        available = (product.quantity or 0) - (product.frozen_quantity or 0) - reserved.get(product_id, 0)
         
-        if available < item.quantity:
+        if available < quantity:
             raise HTTPException(
                 status_code=400,
-                detail=f"Product '{product.name}' not available. Need {item.quantity}, available {available}"
+                detail=f"Product '{product.name}' not available. Need {quantity}, available {available}"
             )
     
-    # 3. Розрахувати total_price та deposit
+    # 4. Розрахувати total_price та deposit (в пам'яті)
+    rental_days = (board.rental_end_date - board.rental_start_date).days + 1
     total_price = 0
     for item in items:
-        product_result = await db.execute(
-            select(Product).where(Product.product_id == item.product_id)
-        )
-        product = product_result.scalar_one()
-        
-        rental_days = (board.rental_end_date - board.rental_start_date).days + 1
+        product = products[item.product_id]
         price = float(product.rental_price) if product.rental_price else 0
-        item_price = price * item.quantity * rental_days
-        total_price += item_price
+        total_price += price * item.quantity * rental_days
     
     # Депозит = 30% від загальної вартості
     deposit_amount = total_price * 0.3
     
-    # 4. Customer info from current_user
     customer = current_user
     
-    # 5. Генерувати order_number
-    # Format: OC-YYYYMMDD-XXXX
-    today = datetime.now().strftime("%Y%m%d")
-    last_order_result = await db.execute(
-        select(Order).where(Order.order_number.like(f"OC-{today}-%")).order_by(desc(Order.order_id)).limit(1)
-    )
-    last_order = last_order_result.scalar_one_or_none()
-    
-    if last_order:
-        last_num = int(last_order.order_number.split('-')[-1])
-        new_num = last_num + 1
-    else:
-        new_num = 1
-    
-    order_number = f"OC-{today}-{new_num:04d}"
-    
-    # 6. Генерувати order_id вручну (workaround для відсутності AUTO_INCREMENT)
-    max_id_result = await db.execute(select(func.max(Order.order_id)))
-    max_id = max_id_result.scalar()
-    new_order_id = (max_id + 1) if max_id else 1
-    
-    # Створити Order з явним order_id
+    # 5. Створити Order; order_id та order_number - з лічильників (order_numbers.py)
     order = Order(
-        order_id=new_order_id,
-        order_number=order_number,
         customer_id=customer_id,
         customer_name=order_data.customer_name,
         phone=order_data.phone,
@@ -1226,23 +1965,27 @@ async def convert_board_to_order(
         updated_at=datetime.utcnow()
     )
     
-    db.add(order)
-    await db.flush()  # Get order_id
+    await insert_order(db, order)
+    order_number = order.order_number
     
-    # 7. Конвертувати soft → hard reservations
-    for item in items:
-        hard_reservation = ProductReservation(
-            id=str(uuid.uuid4()),
-            product_id=item.product_id,
-            order_id=order.order_id,
-            order_number=order_number,
-            quantity=item.quantity,
-            reserved_from=board.rental_start_date,
-            reserved_until=board.rental_end_date,
-            status='active',
-            created_at=datetime.utcnow()
-        )
-        db.add(hard_reservation)
+    # 7. Конвертувати soft → hard reservations одним executemany
+    created_at = datetime.utcnow()
+    hard_reservations = [
+        {
+            'id': str(uuid.uuid4()),
+            'product_id': item.product_id,
+            'sku': products[item.product_id].sku,
+            'order_id': order.order_id,
+            'order_number': order_number,
+            'quantity': item.quantity,
+            'reserved_from': board.rental_start_date,
+            'reserved_until': board.rental_end_date,
+            'status': 'active',
+            'created_at': created_at
+        }
+        for item in items
+    ]
+    await db.execute(insert(ProductReservation), hard_reservations)
     
     # 8. Видалити soft reservations
     await db.execute(
@@ -1257,6 +2000,14 @@ async def convert_board_to_order(
     await db.commit()
     await db.refresh(order)
     
+    # Оновити таймлайни зайнятості після коміту
+    for hard_reservation in hard_reservations:
+        availability.add_hard(
+            hard_reservation['id'], hard_reservation['product_id'],
+            hard_reservation['reserved_from'], hard_reservation['reserved_until'], hard_reservation['quantity']
+        )
+    availability.remove_board_soft(board_id)
+    
     logger.info(f"✅ Order created: {order_number} from board {board_id}")
     
     return order
@@ -1264,7 +2015,12 @@ async def convert_board_to_order(
 # Health check
 @api_router.get("/health")
 async def health_check():
-    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+    return {
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat(),
+        # Черга bcrypt (вхід/реєстрація): depth росте - не вистачає PASSWORD_HASH_WORKERS
+        "password_queue": password_queue.to_dict()
+    }
 
 # Include router
 app.include_router(api_router)
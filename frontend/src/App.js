@@ -12,6 +12,7 @@ import CreateBoardModal from './components/CreateBoardModal';
 import OrderModal from './components/OrderModal';
 import './App.css';
 import api from './api/axios';
+import { boardsAPI } from './api/boards';
 
 // Create a client
 const queryClient = new QueryClient();
@@ -216,15 +217,17 @@ const EventPlannerPage = () => {
       const [categoriesData, subcategoriesData, boardsData] = await Promise.all([
         api.get('/categories').then(r => r.data),
         api.get('/subcategories').then(r => r.data),
-        api.get('/boards').then(r => r.data),
+        api.get('/boards/summary').then(r => r.data),
       ]);
       
       setCategories(categoriesData);
       setAllSubcategories(subcategoriesData);
       setBoards(boardsData);
       
+      // Повний мудборд (з товарами) вантажимо тільки для відкритого
       if (boardsData.length > 0) {
-        setActiveBoard(boardsData[0]);
+        const firstBoard = await api.get(`/boards/${boardsData[0].id}`).then(r => r.data);
+        setActiveBoard(firstBoard);
       }
 
       // Load first page of products
@@ -292,7 +295,7 @@ const EventPlannerPage = () => {
       setActiveBoard(updatedBoard);
       
       // Оновити список boards
-      const boardsData = await api.get('/boards').then(r => r.data);
+      const boardsData = await api.get('/boards/summary').then(r => r.data);
       setBoards(boardsData);
       
     } catch (error) {
@@ -303,9 +306,20 @@ const EventPlannerPage = () => {
     }
   };
 
-  const handleCreateBoard = async (boardData) => {
+  const handleCreateBoard = async (boardData, coverFile) => {
     try {
-      const newBoard = await api.post('/boards', boardData).then(r => r.data);
+      let newBoard = await api.post('/boards', boardData).then(r => r.data);
+      
+      // Обкладинка - окремим multipart-запитом, у мудборді лише посилання
+      if (coverFile) {
+        const formData = new FormData();
+        formData.append('file', coverFile);
+        const cover = await api.post(`/boards/${newBoard.id}/cover`, formData, {
+          headers: { 'Content-Type': 'multipart/form-data' },
+        }).then(r => r.data);
+        newBoard = { ...newBoard, ...cover };
+      }
+      
       setBoards([newBoard, ...boards]);
       setActiveBoard(newBoard);
       setShowNewBoardModal(false);
@@ -332,21 +346,23 @@ const EventPlannerPage = () => {
     }
   };
 
-  const handleSaveCanvas = async (canvasLayout) => {
-    if (!activeBoard) return;
+  // Canvas зберігає зміни сам (PATCH canvas-layout); тут лише оновлюється локальна копія мудборду
+  const handleCanvasSaved = (boardId, canvasLayout, canvasRevision) => {
+    setActiveBoard((board) => (
+      board && board.id === boardId
+        ? { ...board, canvas_layout: canvasLayout, canvas_revision: canvasRevision }
+        : board
+    ));
+  };
 
+  // 409: layout змінили в іншій вкладці - завантажити актуальний мудборд (canvas перемонтується)
+  const handleCanvasConflict = async (boardId) => {
     try {
-      const updatedBoard = await api.patch(`/boards/${activeBoard.id}`, {
-        canvas_layout: canvasLayout,
-      }).then(r => r.data);
-      
-      setActiveBoard(updatedBoard);
-      setBoards(boards.map(b => b.id === updatedBoard.id ? updatedBoard : b));
-      setShowCanvas(false);
-      alert('✅ Візуальний мудборд збережено!');
+      const freshBoard = await boardsAPI.getBoard(boardId);
+      setActiveBoard(freshBoard);
+      alert('Мудборд змінено в іншій вкладці - завантажено актуальну версію');
     } catch (error) {
-      console.error('Failed to save canvas:', error);
-      alert('Помилка збереження мудборду');
+      console.error('Failed to reload board:', error);
     }
   };
 
@@ -478,7 +494,11 @@ const EventPlannerPage = () => {
   const filteredProducts = products;
 
   const calculateBoardTotal = () => {
-    if (!activeBoard || !activeBoard.items) return 0;
+    if (!activeBoard) return 0;
+    
+    // Сервер веде estimated_total для мудбордів з датами
+    if (activeBoard.rental_days) return Number(activeBoard.estimated_total) || 0;
+    if (!activeBoard.items) return 0;
     
     return activeBoard.items.reduce((total, item) => {
       const price = item.product?.rental_price || 0;
@@ -637,8 +657,12 @@ const EventPlannerPage = () => {
             <div style={{padding: '12px 18px 12px', background: '#fafafa'}}>
               <select
                 value={activeBoard?.id || ''}
-                onChange={(e) => {
-                  const board = boards.find(b => b.id === e.target.value);
+                onChange={async (e) => {
+                  if (!e.target.value) {
+                    setActiveBoard(undefined);
+                    return;
+                  }
+                  const board = await api.get(`/boards/${e.target.value}`).then(r => r.data);
                   setActiveBoard(board);
                 }}
                 className="w-full fd-select mb-2"
@@ -676,7 +700,9 @@ const EventPlannerPage = () => {
                       background: '#f5f5f5'
                     }}>
                       <img 
-                        src={activeBoard.cover_image} 
+                        src={activeBoard.cover_variants
+                          ? `${process.env.REACT_APP_BACKEND_URL}/api/${activeBoard.cover_variants.thumb}`
+                          : activeBoard.cover_image} 
                         alt={activeBoard.board_name}
                         style={{
                           width: '100%',
@@ -805,9 +831,11 @@ const EventPlannerPage = () => {
       {/* Moodboard Canvas */}
       {showCanvas && activeBoard && (
         <MoodboardCanvas
+          key={`${activeBoard.id}:${activeBoard.canvas_revision || 0}`}
           board={activeBoard}
           onClose={() => setShowCanvas(false)}
-          onSave={handleSaveCanvas}
+          onSaved={(canvasLayout, canvasRevision) => handleCanvasSaved(activeBoard.id, canvasLayout, canvasRevision)}
+          onConflict={() => handleCanvasConflict(activeBoard.id)}
         />
       )}
 
@@ -7,6 +7,13 @@ export const boardsAPI = {
     return response.data;
   },
 
+  // Lightweight list for the sidebar: no items, only item count and totals
+  getBoardSummaries: async (status) => {
+    const params = status ? { status } : {};
+    const response = await api.get('/boards/summary', { params });
+    return response.data;
+  },
+
   getBoard: async (id) => {
     const response = await api.get(`/boards/${id}`);
     return response.data;
@@ -22,10 +29,34 @@ export const boardsAPI = {
     return response.data;
   },
 
+  // JSON Patch operations on canvas_layout; revision is the one the changes are based on.
+  // Returns { revision }; 409 means the layout was changed elsewhere - reload the board.
+  patchCanvasLayout: async (id, revision, operations) => {
+    const response = await api.patch(`/boards/${id}/canvas-layout`, { revision, operations });
+    return response.data;
+  },
+
+  // Multipart cover upload; returns { cover_image, cover_variants }
+  uploadCover: async (id, file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post(`/boards/${id}/cover`, formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
+
   deleteBoard: async (id) => {
     await api.delete(`/boards/${id}`);
   },
 
+  // Per-day availability for every product on the board (defaults to the board rental dates)
+  getAvailabilityCalendar: async (id, from, to) => {
+    const params = from && to ? { from, to } : {};
+    const response = await api.get(`/boards/${id}/availability-calendar`, { params });
+    return response.data;
+  },
+
   addItem: async (boardId, data) => {
     const response = await api.post(`/boards/${boardId}/items`, data);
     return response.data;
@@ -39,4 +70,10 @@ export const boardsAPI = {
   deleteItem: async (boardId, itemId) => {
     await api.delete(`/boards/${boardId}/items/${itemId}`);
   },
+
+  // Apply many add/update/delete/reorder operations in one request; returns all board items
+  batchItems: async (boardId, operations) => {
+    const response = await api.post(`/boards/${boardId}/items:batch`, operations);
+    return response.data;
+  },
 };
\ No newline at end of file
@@ -17,4 +17,10 @@ export const categoriesAPI = {
     const response = await api.get('/subcategories');
     return response.data;
   },
+
+  // Category -> subcategory tree with product counts (ETag-cached by the browser)
+  getTree: async () => {
+    const response = await api.get('/catalog/tree');
+    return response.data;
+  },
 };
\ No newline at end of file
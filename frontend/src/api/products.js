@@ -6,6 +6,25 @@ export const productsAPI = {
     return response.data;
   },
 
+  // Keyset pagination: pass next_cursor from the previous page as `after`
+  getProductsPage: async (params = {}, after = null) => {
+    const query = after ? { ...params, after } : { ...params, cursor: true };
+    const response = await api.get('/products', { params: query });
+    return response.data;
+  },
+
+  // Counts per category/subcategory/color/material for the same filters as getProducts
+  getFacets: async (params = {}) => {
+    const response = await api.get('/products/facets', { params });
+    return response.data;
+  },
+
+  // Per-day available quantity for the date picker; from/to are YYYY-MM-DD
+  getAvailabilityCalendar: async (id, from, to) => {
+    const response = await api.get(`/products/${id}/availability-calendar`, { params: { from, to } });
+    return response.data;
+  },
+
   getProduct: async (id) => {
     const response = await api.get(`/products/${id}`);
     return response.data;
@@ -15,4 +34,10 @@ export const productsAPI = {
     const response = await api.post('/products/check-availability', data);
     return response.data;
   },
+
+  // items: [{ product_id, quantity, reserved_from, reserved_until }], results keep the same order
+  checkAvailabilityBatch: async (items) => {
+    const response = await api.post('/products/check-availability/batch', items);
+    return response.data;
+  },
 };
\ No newline at end of file
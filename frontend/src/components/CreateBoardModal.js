@@ -26,15 +26,15 @@ const CreateBoardModal = ({ onClose, onCreateBoard }) => {
       }
     });
     
-    // Add image preview if exists (either from URL or file upload)
-    if (imagePreview) {
-      boardData.cover_image = imagePreview;
+    // Uploaded file goes to the cover endpoint after the board is created;
+    // the base64 preview is only for display and is never sent as JSON
+    if (imageFile) {
+      delete boardData.cover_image;
     }
     
     console.log('📤 Sending board data:', boardData);
-    console.log('🖼️ Image preview:', imagePreview);
     
-    onCreateBoard(boardData);
+    onCreateBoard(boardData, imageFile);
   };
 
   const handleChange = (e) => {
@@ -1,5 +1,14 @@
 import React, { useState, useRef, useEffect } from 'react';
 import Moveable from 'react-moveable';
+import { boardsAPI } from '../api/boards';
+import { diffCanvasLayout } from '../lib/canvasPatch';
+
+// Автозбереження після паузи в редагуванні (перетягування, масштаб, текст)
+const AUTOSAVE_DELAY_MS = 1000;
+
+// Знімок стану canvas у вигляді canvas_layout (без undefined-полів, як у JSON на сервері)
+const toLayout = (elements, background, zoom) =>
+  JSON.parse(JSON.stringify({ elements, background, zoom }));
 
 // Layout templates based on the provided image
 const LAYOUT_TEMPLATES = [
@@ -78,16 +87,60 @@ const LAYOUT_TEMPLATES = [
   }
 ];
 
-const MoodboardCanvas = ({ board, onClose, onSave }) => {
-  const [elements, setElements] = useState(board.canvasLayout?.elements || []);
+const MoodboardCanvas = ({ board, onClose, onSaved, onConflict }) => {
+  const [elements, setElements] = useState(board.canvas_layout?.elements || []);
   const [selectedId, setSelectedId] = useState(null);
-  const [background, setBackground] = useState(board.canvasLayout?.background || '#ffffff');
+  const [background, setBackground] = useState(board.canvas_layout?.background || '#ffffff');
   const [textMode, setTextMode] = useState(false);
-  const [zoom, setZoom] = useState(1);
+  const [zoom, setZoom] = useState(board.canvas_layout?.zoom || 1);
   const [showColorPicker, setShowColorPicker] = useState(false);
   const [showTemplates, setShowTemplates] = useState(false);
   const canvasRef = useRef(null);
 
+  // Останній збережений на сервері layout і його ревізія - від них рахуються операції JSON Patch
+  const savedLayoutRef = useRef(toLayout(elements, background, zoom));
+  const revisionRef = useRef(board.canvas_revision || 0);
+  const layoutRef = useRef(savedLayoutRef.current);
+  // Збереження йдуть по черзі: наступне рахується від результату попереднього
+  const saveQueueRef = useRef(Promise.resolve(true));
+  const conflictRef = useRef(false);
+
+  layoutRef.current = toLayout(elements, background, zoom);
+
+  const persistLayout = () => {
+    saveQueueRef.current = saveQueueRef.current.then(async () => {
+      if (conflictRef.current) return false;
+
+      const layout = layoutRef.current;
+      const operations = diffCanvasLayout(savedLayoutRef.current, layout);
+      if (operations.length === 0) return true;
+
+      try {
+        const { revision } = await boardsAPI.patchCanvasLayout(board.id, revisionRef.current, operations);
+        revisionRef.current = revision;
+        savedLayoutRef.current = layout;
+        return true;
+      } catch (error) {
+        if (error.response?.status === 409) {
+          // Layout змінили в іншій вкладці - далі працюємо з актуальною версією мудборду
+          conflictRef.current = true;
+          await onConflict();
+        } else {
+          console.error('Failed to save canvas:', error);
+        }
+        return false;
+      }
+    });
+    return saveQueueRef.current;
+  };
+
+  useEffect(() => {
+    if (diffCanvasLayout(savedLayoutRef.current, layoutRef.current).length === 0) return undefined;
+    const timer = setTimeout(persistLayout, AUTOSAVE_DELAY_MS);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [elements, background, zoom]);
+
   // Initialize elements from board items if not loaded
   useEffect(() => {
     if (elements.length === 0 && board.items && board.items.length > 0) {
@@ -198,15 +251,27 @@ const MoodboardCanvas = ({ board, onClose, onSave }) => {
     setSelectedId(null);
   };
 
+  // Дозберегти зміни і передати мудборду збережений layout та ревізію
+  const finishEditing = async () => {
+    const saved = await persistLayout();
+    if (!conflictRef.current) {
+      onSaved(savedLayoutRef.current, revisionRef.current);
+    }
+    return saved;
+  };
+
   const handleSaveCanvas = async () => {
-    const canvasLayout = {
-      elements,
-      background,
-      zoom,
-      updatedAt: new Date().toISOString(),
-    };
-    
-    await onSave(canvasLayout);
+    if (await finishEditing()) {
+      onClose();
+      alert('✅ Візуальний мудборд збережено!');
+    } else if (!conflictRef.current) {
+      alert('Помилка збереження мудборду');
+    }
+  };
+
+  const handleClose = async () => {
+    await finishEditing();
+    onClose();
   };
 
   const selectedElement = elements.find((el) => el.id === selectedId);
@@ -216,7 +281,7 @@ const MoodboardCanvas = ({ board, onClose, onSave }) => {
       {/* Header */}
       <div className="fd-header flex items-center justify-between" style={{padding: '16px 32px', background: '#fff', borderBottom: '1px solid #e3e3e3'}}>
         <div className="flex items-center gap-4">
-          <button onClick={onClose} className="fd-btn fd-btn-secondary">
+          <button onClick={handleClose} className="fd-btn fd-btn-secondary">
             ← Назад
           </button>
           <h2 className="font-bold" style={{fontSize: '18px', color: '#333'}}>
@@ -617,7 +682,7 @@ const MoodboardCanvas = ({ board, onClose, onSave }) => {
                         paddingBottom: '100%',
                         position: 'relative',
                         background: item.product?.image_url
-                          ? `url(${process.env.REACT_APP_BACKEND_URL}/api/${item.product.image_url})`
+                          ? `url(${process.env.REACT_APP_BACKEND_URL}/api/img/320x320/${item.product.image_url})`
                           : 'linear-gradient(135deg, #f0f0f0, #e4e4e4)',
                         backgroundSize: 'cover',
                         backgroundPosition: 'center',
@@ -33,11 +33,12 @@ const ProductCard = ({ product, onAddToBoard, boardDates }) => {
     }
   };
 
-  const getImageUrl = () => {
+  const getImageUrl = (size = '480x360') => {
     if (product.image_url) {
       // Single source of truth: warehouse via backend proxy
       // image_url from DB: uploads/products/FI8685_1764271319.png
-      return `${process.env.REACT_APP_BACKEND_URL}/api/${product.image_url}`;
+      // Зменшена WebP-копія під розмір картки (/api/img/{w}x{h}/...)
+      return `${process.env.REACT_APP_BACKEND_URL}/api/img/${size}/${product.image_url}`;
     }
     return null;
   };
@@ -48,6 +49,7 @@ const ProductCard = ({ product, onAddToBoard, boardDates }) => {
         {getImageUrl() ? (
           <img
             src={getImageUrl()}
+            srcSet={`${getImageUrl()} 1x, ${getImageUrl('960x720')} 2x`}
             alt={product.name}
             loading="lazy"
             onError={(e) => {
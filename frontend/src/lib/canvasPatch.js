@@ -0,0 +1,89 @@
+// JSON Patch (RFC 6902) operations that turn one canvas_layout into another,
+// for PATCH /boards/{id}/canvas-layout. Elements are matched by id, so a drag
+// becomes a couple of `replace` operations instead of the whole layout.
+
+// Ліміт операцій в одному запиті (CanvasLayoutPatch на сервері)
+const MAX_OPERATIONS = 500;
+
+const pointer = (...tokens) =>
+  tokens.map((token) => `/${String(token).replace(/~/g, '~0').replace(/\//g, '~1')}`).join('');
+
+const isEqual = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+
+const diffElement = (index, previous, next, operations) => {
+  Object.keys(previous).forEach((field) => {
+    if (!(field in next)) {
+      operations.push({ op: 'remove', path: pointer('elements', index, field) });
+    }
+  });
+  Object.keys(next).forEach((field) => {
+    if (!(field in previous)) {
+      operations.push({ op: 'add', path: pointer('elements', index, field), value: next[field] });
+    } else if (!isEqual(previous[field], next[field])) {
+      operations.push({ op: 'replace', path: pointer('elements', index, field), value: next[field] });
+    }
+  });
+};
+
+const diffElements = (previous, next, operations) => {
+  const nextIds = new Set(next.map((element) => element.id));
+
+  // Видалення з кінця, щоб індекси попередніх елементів не зсувались
+  for (let index = previous.length - 1; index >= 0; index -= 1) {
+    if (!nextIds.has(previous[index].id)) {
+      operations.push({ op: 'remove', path: pointer('elements', index) });
+    }
+  }
+
+  const kept = previous.filter((element) => nextIds.has(element.id));
+  const keptById = new Map(kept.map((element) => [element.id, element]));
+  const keptOrder = next.filter((element) => keptById.has(element.id)).map((element) => element.id);
+  if (keptOrder.some((id, index) => kept[index].id !== id)) {
+    // Елементи переставлено - простіше замінити весь масив
+    return false;
+  }
+
+  next.forEach((element, index) => {
+    const existing = keptById.get(element.id);
+    if (existing === undefined) {
+      operations.push({ op: 'add', path: pointer('elements', index), value: element });
+    } else {
+      diffElement(index, existing, element, operations);
+    }
+  });
+  return true;
+};
+
+export function diffCanvasLayout(previous, next) {
+  const before = previous || {};
+  const operations = [];
+
+  Object.keys(before).forEach((key) => {
+    if (!(key in next)) {
+      operations.push({ op: 'remove', path: pointer(key) });
+    }
+  });
+
+  Object.keys(next).forEach((key) => {
+    if (isEqual(before[key], next[key])) return;
+
+    if (key === 'elements' && Array.isArray(before.elements) && Array.isArray(next.elements)) {
+      const elementOperations = [];
+      if (diffElements(before.elements, next.elements, elementOperations)) {
+        operations.push(...elementOperations);
+        return;
+      }
+    }
+    // add на члені об'єкта замінює наявне значення або створює нове
+    operations.push({ op: 'add', path: pointer(key), value: next[key] });
+  });
+
+  if (operations.length > MAX_OPERATIONS) {
+    // Забагато дрібних змін - замінити верхні ключі цілком
+    return [
+      ...Object.keys(before).filter((key) => !(key in next)).map((key) => ({ op: 'remove', path: pointer(key) })),
+      ...Object.keys(next).map((key) => ({ op: 'add', path: pointer(key), value: next[key] })),
+    ];
+  }
+  return operations;
+}
@@ -0,0 +1,156 @@
+"""
+Round trips of the board item endpoints (add / update / delete).
+
+Each endpoint must run a fixed, small number of SQL statements in one
+transaction: a joined lookup of board + product + existing item, then the
+writes. Statements are counted with a before_cursor_execute listener on an
+in-memory SQLite engine that replaces the MySQL session.
+"""
+import asyncio
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import auth  # noqa: E402
+import database  # noqa: E402
+import server  # noqa: E402
+from models import Customer, EventBoardItem, Product, SoftReservation  # noqa: E402
+
+
+class SQLiteUpsert:
+    """Stand-in for sqlalchemy.dialects.mysql.insert: ON DUPLICATE KEY UPDATE -> ON CONFLICT"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def values(self, *args, **kwargs):
+        self.statement = sqlite_insert(self.model).values(*args, **kwargs)
+        self.inserted = self.statement.excluded
+        return self
+
+    def on_duplicate_key_update(self, **kwargs):
+        unique = [
+            column.name
+            for constraint in self.model.__table__.constraints
+            if constraint.__class__.__name__ == 'UniqueConstraint'
+            for column in constraint.columns
+        ]
+        return self.statement.on_conflict_do_update(index_elements=unique or None, set_=kwargs)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    statements = []
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def get_db():
+        async with session_factory() as session:
+            yield session
+
+    customer = Customer(customer_id=1, email='planner@example.com', is_active=True, email_verified=False)
+
+    async def get_current_user():
+        return customer
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(database.Base.metadata.create_all)
+        async with session_factory() as session:
+            session.add(Customer(customer_id=1, email='planner@example.com', is_active=True, email_verified=False))
+            session.add(Product(
+                product_id=1, sku='VASE-1', name='Ваза', rental_price=100, quantity=10,
+                frozen_quantity=0, status=1, synced_at=datetime(2025, 1, 1)
+            ))
+            await session.commit()
+
+    asyncio.run(setup())
+    monkeypatch.setattr(server, 'mysql_insert', SQLiteUpsert)
+    server.app.dependency_overrides[database.get_db] = get_db
+    server.app.dependency_overrides[auth.get_current_user] = get_current_user
+
+    yield session_factory, statements
+
+    server.app.dependency_overrides.clear()
+    asyncio.run(engine.dispose())
+
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test')
+
+
+def test_item_endpoints_use_fixed_round_trips(api):
+    session_factory, statements = api
+    start = date.today() + timedelta(days=1)
+
+    async def scenario():
+        async with client() as c:
+            board = (await c.post('/api/boards', json={
+                'board_name': 'Весілля',
+                'rental_start_date': str(start),
+                'rental_end_date': str(start + timedelta(days=2)),
+            })).json()
+            items_url = f"/api/boards/{board['id']}/items"
+
+            # board + product + existing item одним запитом, UPDATE estimated_total, INSERT item, upsert soft
+            statements.clear()
+            response = await c.post(items_url, json={'product_id': 1, 'quantity': 2})
+            assert response.status_code == 201
+            assert len(statements) == 4
+
+            # Повторне додавання того ж товару збільшує кількість - стільки ж запитів
+            statements.clear()
+            response = await c.post(items_url, json={'product_id': 1, 'quantity': 1})
+            assert response.status_code == 201
+            assert response.json()['quantity'] == 3
+            assert len(statements) == 4
+            item_id = response.json()['id']
+
+            statements.clear()
+            response = await c.patch(f"{items_url}/{item_id}", json={'quantity': 5})
+            assert response.status_code == 200
+            assert response.json()['quantity'] == 5
+            assert len(statements) == 4
+
+            statements.clear()
+            response = await c.delete(f"{items_url}/{item_id}")
+            assert response.status_code == 204
+            assert len(statements) == 4
+
+        async with session_factory() as session:
+            assert (await session.execute(select(func.count()).select_from(EventBoardItem))).scalar() == 0
+            assert (await session.execute(select(func.count()).select_from(SoftReservation))).scalar() == 0
+
+    asyncio.run(scenario())
+
+
+def test_missing_board_or_product_costs_one_query(api):
+    _, statements = api
+
+    async def scenario():
+        async with client() as c:
+            board = (await c.post('/api/boards', json={'board_name': 'Корпоратив'})).json()
+
+            statements.clear()
+            response = await c.post(f"/api/boards/{board['id']}/items", json={'product_id': 999})
+            assert response.status_code == 404
+            assert len(statements) == 1
+
+            statements.clear()
+            response = await c.patch('/api/boards/missing/items/missing', json={'quantity': 2})
+            assert response.status_code == 404
+            assert len(statements) == 1
+
+    asyncio.run(scenario())